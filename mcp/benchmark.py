@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+P-Word调试工具性能基准
+只使用Python内置库(responsiveness需要MCP服务器的依赖)，用法: python3 benchmark.py process --spawn 2000
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from devtools_probe import DEVTOOLS_PROCESS_KEYWORDS, scan_proc_processes
+
+
+def measure(func, repeat):
+    """执行repeat次，返回(最小耗时, 平均耗时)，单位毫秒"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), sum(timings) / len(timings)
+
+
+def ps_aux_scan():
+    """原实现: fork ps aux 后扫描整张进程表文本"""
+    result = subprocess.run(['ps', 'aux'], capture_output=True, text=True)
+    output = result.stdout.lower()
+    if any(keyword in output for keyword in DEVTOOLS_PROCESS_KEYWORDS):
+        for line in result.stdout.split('\n'):
+            if any(keyword in line.lower() for keyword in DEVTOOLS_PROCESS_KEYWORDS):
+                return line.strip()
+    return None
+
+
+def bench_process(args):
+    """进程检测: ps aux vs /proc"""
+    if scan_proc_processes() is None:
+        print("❌ 当前系统没有/proc，无法对比")
+        return 1
+
+    children = []
+    try:
+        # 模拟进程很多的主机
+        for _ in range(args.spawn):
+            children.append(subprocess.Popen(['sleep', '600']))
+
+        print(f"📊 进程检测基准 (进程数: {len(os.listdir('/proc'))}, 重复: {args.repeat}次)")
+        for label, func in [("ps aux", ps_aux_scan), ("/proc", scan_proc_processes)]:
+            best, mean = measure(func, args.repeat)
+            print(f"   • {label:8s} 最快 {best:8.2f}ms  平均 {mean:8.2f}ms")
+    finally:
+        for child in children:
+            child.kill()
+        for child in children:
+            child.wait()
+    return 0
+
+
+def make_project(root, file_count):
+    """生成一个有file_count个js文件的模拟项目"""
+    miniprogram = os.path.join(root, 'miniprogram')
+    os.makedirs(miniprogram)
+    with open(os.path.join(root, 'project.config.json'), 'w') as f:
+        f.write('{"miniprogramRoot": "miniprogram/"}')
+    with open(os.path.join(miniprogram, 'app.json'), 'w') as f:
+        f.write('{"pages": ["pages/index/index"]}')
+    body = ''.join(f"function f{i}() {{ console.log('line {i}'); }}\n" for i in range(400))
+    for i in range(file_count):
+        directory = os.path.join(miniprogram, 'pages', f'p{i % 50}')
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f'm{i}.js'), 'w') as f:
+            f.write(body + "console.error('failed');\n")
+
+
+def load_server():
+    """按文件路径加载MCP服务器模块(文件名含连字符)"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wechat-devtools-mcp-server.py')
+    spec = importlib.util.spec_from_file_location('wechat_devtools_mcp_server', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+async def poll_while(server, task, interval=0.005):
+    """task运行期间不断调用read_debug_logs
+
+    返回每轮(调用+等待interval)的实际耗时(毫秒)；事件循环被阻塞时，
+    这段时间会远超interval
+    """
+    gaps = []
+    while not task.done():
+        start = time.perf_counter()
+        await server.read_debug_logs(since=0, max=10)
+        await asyncio.sleep(interval)
+        gaps.append((time.perf_counter() - start) * 1000)
+    return gaps
+
+
+def bench_responsiveness(args):
+    """项目分析期间并发的read_debug_logs是否保持响应"""
+    server = load_server()
+    # 不连接真实的开发者工具
+    server.connector.console_session.start = lambda: None
+
+    with tempfile.TemporaryDirectory() as root:
+        make_project(root, args.files)
+        server.connector.project_path = root
+
+        async def run():
+            start = time.perf_counter()
+            analysis = asyncio.get_running_loop().create_task(server.analyze_project_errors())
+            gaps = await poll_while(server, analysis)
+            await analysis
+            return (time.perf_counter() - start) * 1000, gaps
+
+        elapsed, gaps = asyncio.run(run())
+
+    print(f"📊 事件循环响应基准 (文件数: {args.files})")
+    print(f"   • 项目分析耗时 {elapsed:8.1f}ms")
+    print(f"   • 期间read_debug_logs轮询 {len(gaps)}次，"
+          f"最长间隔 {max(gaps):8.1f}ms  平均 {sum(gaps) / len(gaps):6.2f}ms")
+    # 分析阻塞事件循环时只能完成一两轮，最长间隔接近分析总耗时
+    if max(gaps) > args.max_stall:
+        print(f"❌ 最长间隔超过 {args.max_stall}ms，事件循环被阻塞")
+        return 1
+    print("✅ 分析期间事件循环保持响应")
+    return 0
+
+
+# 需要统计启动耗时的MCP服务器
+SERVER_SCRIPTS = ('wechat-devtools-mcp-server.py', 'wechat-devtools-mcp.py')
+
+
+def import_times(script):
+    """用 -X importtime 加载script(不执行__main__)
+
+    返回(总耗时毫秒, {顶层模块: 累计耗时毫秒}, 实际加载的全部模块名)
+    """
+    code = ("import importlib.util as u; "
+            f"s = u.spec_from_file_location('server', {script!r}); "
+            "m = u.module_from_spec(s); s.loader.exec_module(m)")
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    elapsed = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    modules = {}
+    loaded = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        loaded.add(name.strip())
+        # 缩进表示被其他模块导入，只统计顶层
+        if not name.startswith('  '):
+            modules[name.strip()] = int(cumulative) / 1000
+    return elapsed, modules, loaded
+
+
+def bench_startup(args):
+    """MCP服务器启动时的导入耗时"""
+    status = 0
+    for script in SERVER_SCRIPTS:
+        runs = [import_times(script) for _ in range(args.repeat)]
+        best, modules, loaded = min(runs, key=lambda run: run[0])
+        print(f"📊 {script} 启动耗时 (最快 {best:.1f}ms, 重复 {args.repeat}次)")
+        for name, cost in sorted(modules.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"   • {name:30s} {cost:8.1f}ms")
+        # 这些依赖应在首次使用时才加载
+        eager = [name for name in args.deferred if name in loaded]
+        if eager:
+            print(f"❌ 启动时加载了应延迟导入的模块: {', '.join(eager)}")
+            status = 1
+        if args.max_ms and best > args.max_ms:
+            print(f"❌ 启动耗时超过 {args.max_ms}ms")
+            status = 1
+    return status
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="P-Word调试工具性能基准")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    process_parser = subparsers.add_parser('process', help="进程检测: ps aux vs /proc")
+    process_parser.add_argument('--spawn', type=int, default=0, help="额外启动的空闲进程数")
+    process_parser.add_argument('--repeat', type=int, default=20, help="重复次数")
+    process_parser.set_defaults(func=bench_process)
+
+    responsive_parser = subparsers.add_parser('responsiveness', help="项目分析期间MCP工具的响应延迟")
+    responsive_parser.add_argument('--files', type=int, default=1000, help="模拟项目的js文件数")
+    responsive_parser.add_argument('--max-stall', type=float, default=250.0,
+                                   help="允许的最长轮询间隔(毫秒)")
+    responsive_parser.set_defaults(func=bench_responsiveness)
+
+    startup_parser = subparsers.add_parser('startup', help="MCP服务器启动导入耗时(-X importtime)")
+    startup_parser.add_argument('--repeat', type=int, default=3, help="重复次数")
+    startup_parser.add_argument('--top', type=int, default=8, help="列出最慢的顶层模块数")
+    startup_parser.add_argument('--max-ms', type=float, default=0, help="启动耗时上限(毫秒)，0为不检查")
+    startup_parser.add_argument('--deferred', nargs='*', default=['aiohttp', 'websockets', 'psutil'],
+                                help="启动时不应加载的模块")
+    startup_parser.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
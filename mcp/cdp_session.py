@@ -0,0 +1,656 @@
+#!/usr/bin/env python3
+"""
+微信开发者工具CDP会话 - 常驻版
+与MCP服务器同生命周期，后台持续接收控制台事件并写入环形缓冲区
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+from collections import deque
+from contextlib import asynccontextmanager
+from itertools import islice
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from devtools_logs import LogRecord, MessageGroups, parse_console_event
+from devtools_probe import DevToolsProcessFinder, StatusCache, candidate_ports, discover_debug_port
+from lazy_import import lazy_import
+
+# 首次建立连接时才加载
+websockets = lazy_import('websockets')
+aiohttp = lazy_import('aiohttp')
+
+logger = logging.getLogger(__name__)
+
+
+class ConsoleLogBuffer:
+    """控制台日志环形缓冲区，超出条数或字节预算时丢弃最旧的记录
+
+    多个调试目标的记录按时间合并；乱序到达的记录只在末尾附近回溯插入。
+    每条记录按到达顺序分配递增序号，客户端可用序号作为游标增量拉取；
+    另按到达顺序保存一份引用，游标可直接换算成位置
+    """
+
+    # 乱序插入时最多回溯的条数
+    MAX_REORDER = 64
+
+    def __init__(self, capacity: int = 500000, max_bytes: int = 64 * 1024 * 1024):
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        # (序号, 记录)
+        self._records = deque()
+        self.nbytes = 0
+        self.last_seq = 0
+        # 因容量淘汰的最大序号
+        self._evicted_seq = 0
+        # 按序号排列的(序号, 记录)，前_head项已移除；序号连续，游标可直接换算成下标
+        self._arrivals = []
+        self._head = 0
+        # 已淘汰但还未从_arrivals头部移除的序号
+        self._evicted = set()
+
+    @staticmethod
+    def _size(record) -> int:
+        nbytes = getattr(record, 'nbytes', None)
+        if nbytes is not None:
+            return nbytes()
+        return sys.getsizeof(record) + sys.getsizeof(record.message)
+
+    def _evict(self):
+        seq, record = self._records.popleft()
+        self.nbytes -= self._size(record)
+        self._evicted_seq = max(self._evicted_seq, seq)
+        self._evicted.add(seq)
+        self._trim_arrivals()
+
+    def _trim_arrivals(self):
+        """移除_arrivals头部已淘汰的记录，移除的过多时压缩列表"""
+        arrivals = self._arrivals
+        head = self._head
+        while head < len(arrivals) and arrivals[head][0] in self._evicted:
+            self._evicted.discard(arrivals[head][0])
+            # 立即释放记录，字节预算才准确
+            arrivals[head] = None
+            head += 1
+        if head > 4096 and head * 2 > len(arrivals):
+            del arrivals[:head]
+            head = 0
+        self._head = head
+
+    def append(self, record: LogRecord) -> int:
+        """写入记录，返回分配的序号"""
+        self.last_seq += 1
+        item = (self.last_seq, record)
+        records = self._records
+
+        # 找到插入位置：跳过末尾时间更晚的记录
+        index = len(records)
+        if record.time is not None:
+            floor = max(0, index - self.MAX_REORDER)
+            while index > floor:
+                previous = records[index - 1][1].time
+                if previous is None or previous <= record.time:
+                    break
+                index -= 1
+
+        self._arrivals.append(item)
+        if len(records) >= self.capacity:
+            self._evict()
+            index -= 1
+        if index >= len(records):
+            records.append(item)
+        else:
+            records.insert(max(index, 0), item)
+        self.nbytes += self._size(record)
+
+        while self.nbytes > self.max_bytes and len(records) > 1:
+            self._evict()
+        return self.last_seq
+
+    def latest(self, limit: int = 10) -> List[LogRecord]:
+        """返回最新的limit条记录(按时间先后)"""
+        if limit <= 0:
+            return []
+        newest = [record for _, record in islice(reversed(self._records), limit)]
+        newest.reverse()
+        return newest
+
+    def iter_newest(self) -> Iterator[LogRecord]:
+        """从最新的记录往前遍历(遍历期间不能写入)"""
+        return (record for _, record in reversed(self._records))
+
+    def since(self, cursor: int, limit: int = 100,
+              predicate: Optional[Callable[[LogRecord], bool]] = None
+              ) -> Tuple[List[Tuple[int, LogRecord]], int, int]:
+        """返回序号大于cursor且满足predicate的最多limit条记录(按序号)
+
+        同时返回下一个游标和被淘汰而漏掉的条数；下一个游标小于last_seq说明还有后续页
+        """
+        dropped = self._evicted_seq - cursor if cursor < self._evicted_seq else 0
+        if limit <= 0:
+            return [], cursor, dropped
+
+        arrivals = self._arrivals
+        start = self._head
+        if start < len(arrivals):
+            start += max(0, cursor + 1 - arrivals[start][0])
+        collected = []
+        # 从游标处顺序扫描，凑满limit条即停止
+        for index in range(start, len(arrivals)):
+            item = arrivals[index]
+            if item[0] in self._evicted:
+                continue
+            if predicate is None or predicate(item[1]):
+                collected.append(item)
+                if len(collected) >= limit:
+                    return collected, item[0], dropped
+        # 已检查到最新一条
+        return collected, max(cursor, self.last_seq), dropped
+
+    def clear(self):
+        self._records.clear()
+        self._arrivals = []
+        self._head = 0
+        self._evicted.clear()
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self._records)
+
+
+class CDPError(Exception):
+    """CDP命令返回错误"""
+
+    def __init__(self, method: str, error: Dict):
+        super().__init__(f"{method}: {error.get('message', error)}")
+        self.method = method
+        self.code = error.get('code')
+
+
+class CDPClient:
+    """单个websocket上的CDP客户端
+
+    自动分配命令id，多条命令可同时在途(用asyncio.gather并发发送即可流水线化)，
+    每条命令的响应通过future返回；事件按方法名分发给订阅者
+    """
+
+    def __init__(self, ws_url: str, open_timeout: float = 5):
+        self.ws_url = ws_url
+        self.open_timeout = open_timeout
+        self._websocket = None
+        self._reader = None
+        self._next_id = 0
+        # 命令id -> (方法名, future)
+        self._pending = {}
+        # 事件方法名 -> 回调列表，'*' 订阅所有事件
+        self._subscribers = {}
+
+    @property
+    def connected(self) -> bool:
+        return self._reader is not None and not self._reader.done()
+
+    async def connect(self) -> "CDPClient":
+        self._websocket = await websockets.connect(self.ws_url, open_timeout=self.open_timeout,
+                                                   max_size=None)
+        self._reader = asyncio.get_running_loop().create_task(self._read_loop())
+        return self
+
+    async def close(self):
+        if self._websocket is not None:
+            await self._websocket.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+
+    async def __aenter__(self) -> "CDPClient":
+        return await self.connect()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def wait_closed(self):
+        """等待连接断开(读取循环结束)"""
+        if self._reader is not None:
+            await asyncio.shield(self._reader)
+
+    def on(self, event: str, callback: Callable[[Dict], None]) -> Callable[[], None]:
+        """订阅事件，回调参数为完整的事件消息；返回取消订阅的函数"""
+        callbacks = self._subscribers.setdefault(event, [])
+        callbacks.append(callback)
+
+        def unsubscribe():
+            if callback in callbacks:
+                callbacks.remove(callback)
+        return unsubscribe
+
+    async def send(self, method: str, params: Optional[Dict] = None, timeout: float = 10) -> Dict:
+        """发送命令并等待其响应，返回result；CDP报错时抛出CDPError"""
+        if not self.connected:
+            raise ConnectionError("CDP连接未建立或已断开")
+        self._next_id += 1
+        command_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[command_id] = (method, future)
+        message = {"id": command_id, "method": method}
+        if params:
+            message["params"] = params
+        try:
+            await self._websocket.send(json.dumps(message))
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(command_id, None)
+
+    async def _read_loop(self):
+        try:
+            async for message in self._websocket:
+                data = json.loads(message)
+                command_id = data.get('id')
+                if command_id is not None:
+                    method, future = self._pending.get(command_id, (None, None))
+                    if future is None or future.done():
+                        continue
+                    if 'error' in data:
+                        future.set_exception(CDPError(method, data['error']))
+                    else:
+                        future.set_result(data.get('result', {}))
+                else:
+                    self._dispatch(data)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for _, future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("CDP连接已断开"))
+
+    def _dispatch(self, event: Dict):
+        for key in (event.get('method'), '*'):
+            for callback in list(self._subscribers.get(key, ())):
+                try:
+                    callback(event)
+                except Exception as e:
+                    logger.warning(f"处理CDP事件失败({key}): {e}")
+
+
+class ReplayFilter:
+    """过滤重新挂载时Runtime.enable重放的历史控制台消息
+
+    记录目标已采集的最新时间戳及该时刻的条数；新连接上不晚于它的消息是重放的历史，跳过
+    """
+
+    def __init__(self):
+        self.time = None
+        self.count = 0
+        # 本次连接还要跳过的、与最新时间戳相同的消息条数
+        self._skip = 0
+
+    def reconnect(self):
+        self._skip = self.count
+
+    def accept(self, time: Optional[float]) -> bool:
+        if time is None:
+            return True
+        if self.time is not None:
+            if time < self.time:
+                return False
+            if time == self.time:
+                if self._skip:
+                    self._skip -= 1
+                    return False
+                self.count += 1
+                return True
+        self.time = time
+        self.count = 1
+        self._skip = 0
+        return True
+
+
+# 来源标签中targetId保留的长度
+SOURCE_ID_LENGTH = 8
+
+
+def source_label(target_id: str, title: str = '') -> str:
+    """调试目标的来源标签：标题加targetId前几位，同名目标的日志也能区分"""
+    short_id = target_id[:SOURCE_ID_LENGTH]
+    return f"{title}#{short_id}" if title else short_id
+
+
+class CDPConsoleSession:
+    """常驻CDP会话
+
+    在浏览器端点上订阅调试目标的创建/变化/销毁事件，维护实时目标表，
+    自动连接所有匹配的目标；页面重新编译产生新目标或连接断开时自动重新挂载
+    """
+
+    def __init__(self, resolve_browser: Callable[[], Awaitable[Optional[str]]],
+                 target_filter: Callable[[Dict], bool] = lambda target: True,
+                 buffer: Optional[ConsoleLogBuffer] = None,
+                 retry_interval: float = 1.0, max_retry_interval: float = 30.0,
+                 keep_raw: bool = False):
+        # 返回浏览器端点的webSocketDebuggerUrl(不可用时为None)
+        self.resolve_browser = resolve_browser
+        self.target_filter = target_filter
+        self.buffer = buffer or ConsoleLogBuffer()
+        # 整个会话期间重复消息的归并统计
+        self.groups = MessageGroups()
+        # 是否随记录保留原始事件JSON(排查问题时再开启)
+        self.keep_raw = keep_raw
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self._task = None
+        self._browser = None
+        # 页面目标的websocket地址前缀，如 ws://127.0.0.1:9222/devtools/page/
+        self._page_url = ''
+        # targetId -> TargetInfo，浏览器上的全部目标
+        self.targets = {}
+        # targetId -> 采集任务
+        self._captures = {}
+        # targetId -> (目标名称, CDP客户端)，已连接的调试目标，工具可借用客户端发送命令
+        self._clients = {}
+        # 目标或连接状态变化时的回调
+        self._listeners = []
+
+    def add_listener(self, callback: Callable[[], None]):
+        """注册回调：目标增删改、浏览器端点或目标连接建立/断开时调用"""
+        self._listeners.append(callback)
+
+    def _notify(self):
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"状态回调失败: {e}")
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def tracking(self) -> bool:
+        """是否已连上浏览器端点，目标表为实时数据"""
+        return self._browser is not None and self._browser.connected
+
+    @property
+    def matching_targets(self) -> List[Dict]:
+        return [target for target in self.targets.values() if self.target_filter(target)]
+
+    @property
+    def connected(self) -> bool:
+        return bool(self._clients)
+
+    @property
+    def connected_targets(self) -> List[str]:
+        return sorted(source for source, _ in self._clients.values())
+
+    def client(self, target: str = '') -> Optional[CDPClient]:
+        """来源标签(标题#targetId前缀)包含target(不区分大小写)的已连接目标的客户端，
+        target为空时取第一个"""
+        target = target.lower()
+        for source, client in sorted(self._clients.values(), key=lambda entry: entry[0]):
+            if target in source.lower():
+                return client
+        return None
+
+    def start(self):
+        """启动后台采集任务(重复调用无副作用)"""
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """停止后台采集任务"""
+        tasks = list(self._captures.values())
+        if self._task is not None:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._captures.clear()
+        self._clients.clear()
+        self.targets.clear()
+
+    async def _run(self):
+        """保持与浏览器端点的连接，断开后按指数退避重连"""
+        delay = self.retry_interval
+        while True:
+            try:
+                browser_url = await self.resolve_browser()
+                if browser_url:
+                    await self._track(browser_url)
+                    delay = self.retry_interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"浏览器端点连接失败: {e}")
+            finally:
+                self._forget_targets()
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_interval)
+
+    async def _track(self, browser_url: str):
+        """订阅目标事件直到浏览器端点断开"""
+        parts = urlsplit(browser_url)
+        self._page_url = f"{parts.scheme}://{parts.netloc}/devtools/page/"
+        async with CDPClient(browser_url) as browser:
+            browser.on('Target.targetCreated', self._on_target_info)
+            browser.on('Target.targetInfoChanged', self._on_target_info)
+            browser.on('Target.targetDestroyed', self._on_target_destroyed)
+            # 开启后会先为已有的目标逐个发出targetCreated
+            await browser.send('Target.setDiscoverTargets', {'discover': True})
+            self._browser = browser
+            logger.info("已订阅调试目标事件")
+            self._notify()
+            try:
+                await browser.wait_closed()
+            finally:
+                self._browser = None
+                self._notify()
+
+    def _on_target_info(self, event: Dict):
+        info = event.get('params', {}).get('targetInfo', {})
+        target_id = info.get('targetId')
+        if not target_id:
+            return
+        self.targets[target_id] = info
+
+        task = self._captures.get(target_id)
+        if self.target_filter(info):
+            if task is None or task.done():
+                self._captures[target_id] = asyncio.get_running_loop().create_task(
+                    self._attach(target_id)
+                )
+        elif task is not None:
+            # 目标跳转到了不相关的页面
+            task.cancel()
+            del self._captures[target_id]
+        self._notify()
+
+    def _on_target_destroyed(self, event: Dict):
+        target_id = event.get('params', {}).get('targetId')
+        self.targets.pop(target_id, None)
+        task = self._captures.pop(target_id, None)
+        if task is not None:
+            task.cancel()
+        self._notify()
+
+    def _forget_targets(self):
+        for task in self._captures.values():
+            task.cancel()
+        self._captures.clear()
+        self.targets.clear()
+
+    async def _attach(self, target_id: str):
+        """采集目标的控制台日志，连接断开而目标仍在时重新挂载"""
+        replay = ReplayFilter()
+        while target_id in self.targets:
+            info = self.targets[target_id]
+            await self._capture(target_id, source_label(target_id, info.get('title', '')), replay)
+            await asyncio.sleep(self.retry_interval)
+
+    async def _capture(self, target_id: str, source: str, replay: ReplayFilter):
+        def on_console(event: Dict):
+            raw = json.dumps(event, ensure_ascii=False) if self.keep_raw else None
+            record = parse_console_event(event, source=source, raw=raw)
+            if record is not None and replay.accept(record.time):
+                self.buffer.append(record)
+                self.groups.feed(record)
+
+        client = None
+        try:
+            async with CDPClient(self._page_url + target_id) as client:
+                # console调用在Console.messageAdded上也会报告一次，只订阅Runtime域避免重复
+                client.on('Runtime.consoleAPICalled', on_console)
+                replay.reconnect()
+                await client.send('Runtime.enable')
+                self._clients[target_id] = (source, client)
+                logger.info(f"CDP会话已连接: {source}")
+                self._notify()
+                await client.wait_closed()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"CDP会话断开({source}): {e}")
+        finally:
+            # 只删除本次连接登记的客户端，重新挂载后的新连接不受影响
+            entry = self._clients.get(target_id)
+            if entry is not None and entry[1] is client:
+                del self._clients[target_id]
+                self._notify()
+
+
+def keep_raw_events() -> bool:
+    """是否随记录保留原始CDP事件，通过环境变量 PWORD_KEEP_RAW=1 开启(排查解析问题时使用)"""
+    return os.environ.get('PWORD_KEEP_RAW', '').lower() in ('1', 'true', 'yes')
+
+
+class DevToolsConnection:
+    """两个MCP服务器共用的开发者工具连接
+
+    共享的keep-alive HTTP会话、调试端口发现、浏览器端点、常驻CDP会话和状态快照；
+    lifespan随服务器启动CDP会话，退出时关闭
+    """
+
+    def __init__(self):
+        self.debug_port = None
+        self.process_finder = DevToolsProcessFinder()
+        # 共享的HTTP连接池，随服务器生命周期复用
+        self._http_session = None
+        # 常驻CDP会话，后台持续采集控制台日志
+        self.console_session = CDPConsoleSession(self.get_browser_endpoint, self.is_project_target,
+                                                 keep_raw=keep_raw_events())
+        # 状态快照：超过TTL、进程退出或CDP目标/连接变化时失效
+        self.status_cache = StatusCache(self.collect_status, validate=self._status_valid)
+        self.console_session.add_listener(self.status_cache.invalidate)
+
+    def http_session(self) -> "aiohttp.ClientSession":
+        """获取共享的keep-alive HTTP会话(首次使用时创建)"""
+        if self._http_session is None or self._http_session.closed:
+            self._http_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=4, keepalive_timeout=60)
+            )
+        return self._http_session
+
+    async def close(self):
+        """关闭共享HTTP会话"""
+        if self._http_session is not None and not self._http_session.closed:
+            await self._http_session.close()
+        self._http_session = None
+
+    @asynccontextmanager
+    async def lifespan(self, server):
+        """随服务器启动常驻CDP会话，退出时关闭"""
+        self.console_session.start()
+        try:
+            yield
+        finally:
+            await self.console_session.stop()
+            await self.close()
+
+    async def find_devtools_process(self) -> Optional[Dict]:
+        """查找微信开发者工具进程(进程扫描在线程中执行)"""
+        try:
+            return await asyncio.to_thread(self.process_finder.find)
+        except Exception as e:
+            logger.error(f"查找进程失败: {e}")
+        return None
+
+    async def get_debug_port(self) -> Optional[int]:
+        """获取调试端口"""
+        if self.debug_port:
+            return self.debug_port
+
+        # 优先从进程命令行或DevToolsActivePort读取
+        process = await self.find_devtools_process()
+        port = await asyncio.to_thread(discover_debug_port, process.get('cmdline') if process else None)
+        if port:
+            self.debug_port = port
+            return port
+
+        # 回退到端口探测
+        for port in candidate_ports():
+            try:
+                async with self.http_session().get(f'http://127.0.0.1:{port}/json/version',
+                                                   timeout=aiohttp.ClientTimeout(total=2)) as resp:
+                    if resp.status == 200:
+                        self.debug_port = port
+                        return port
+            except Exception:
+                continue
+        return None
+
+    @staticmethod
+    def is_project_target(target: Dict) -> bool:
+        """是否为P-Word相关的调试目标"""
+        return ('p-word' in target.get('title', '').lower() or
+                'miniprogram' in target.get('url', '').lower())
+
+    async def get_browser_endpoint(self) -> Optional[str]:
+        """获取浏览器端点的websocket地址，用于订阅调试目标事件"""
+        port = await self.get_debug_port()
+        if not port:
+            return None
+
+        try:
+            async with self.http_session().get(f'http://127.0.0.1:{port}/json/version',
+                                               timeout=aiohttp.ClientTimeout(total=5)) as resp:
+                if resp.status == 200:
+                    return (await resp.json()).get('webSocketDebuggerUrl')
+        except Exception as e:
+            logger.error(f"获取浏览器端点失败: {e}")
+            # 开发者工具可能已重启，下次重新探测端口
+            self.debug_port = None
+        return None
+
+    async def get_debug_targets(self) -> List[Dict]:
+        """获取调试目标(CDP会话已订阅目标事件时直接取实时目标表)"""
+        if self.console_session.tracking:
+            return self.console_session.matching_targets
+
+        port = await self.get_debug_port()
+        if not port:
+            return []
+
+        try:
+            async with self.http_session().get(f'http://127.0.0.1:{port}/json',
+                                               timeout=aiohttp.ClientTimeout(total=5)) as resp:
+                if resp.status == 200:
+                    return [target for target in await resp.json() if self.is_project_target(target)]
+        except Exception as e:
+            logger.error(f"获取调试目标失败: {e}")
+            self.debug_port = None
+        return []
+
+    async def collect_status(self) -> Dict:
+        """采集进程、调试端口、调试目标的状态快照"""
+        process = await self.find_devtools_process()
+        if not process:
+            return {'process': None, 'port': None, 'targets': []}
+        port = await self.get_debug_port()
+        targets = await self.get_debug_targets() if port else []
+        return {'process': process, 'port': port, 'targets': targets}
+
+    def _status_valid(self, status: Dict) -> bool:
+        """快照中的进程退出后立即失效"""
+        return status['process'] is None or self.process_finder.alive()
@@ -8,9 +8,10 @@ import os
 import sys
 import json
 import subprocess
-import psutil
 from datetime import datetime
 from pathlib import Path
+from devtools_probe import DevToolsProcessFinder, candidate_ports, open_ports
+from project_scanner import ProjectScanner, console_calls, missing_files
 
 class PWordDebugAssistant:
     """P-Word项目调试助手"""
@@ -19,6 +20,13 @@ class PWordDebugAssistant:
         self.project_path = "/Users/gongshenshen/KnowledgeBase/20_学习中/P-Word"
         self.issues = []
         self.fixes = []
+        self._project_files = None
+    
+    def project_files(self):
+        """整个项目只遍历一次，结果供各项检查共用"""
+        if self._project_files is None:
+            self._project_files = ProjectScanner(self.project_path).scan()
+        return self._project_files
         
     def check_project_structure(self):
         """检查项目结构"""
@@ -33,9 +41,9 @@ class PWordDebugAssistant:
             "miniprogram/pages/demo/demo.js"
         ]
         
+        missing = missing_files(self.project_files(), required_files)
         for file_path in required_files:
-            full_path = os.path.join(self.project_path, file_path)
-            if os.path.exists(full_path):
+            if file_path not in missing:
                 print(f"   ✅ {file_path}")
             else:
                 print(f"   ❌ {file_path} - 缺失")
@@ -45,22 +53,7 @@ class PWordDebugAssistant:
         """检查微信开发者工具进程"""
         print("\n🔍 微信开发者工具进程检查:")
         
-        devtools_processes = []
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-            try:
-                name = proc.info['name'].lower()
-                cmdline = ' '.join(proc.info['cmdline'] or []).lower()
-                
-                # 更精确的匹配微信开发者工具
-                if ('wechatwebdevtools' in name or 
-                    'wechatdevtools' in name or
-                    'wx_dev_tools' in name or
-                    'devtools' in name and 'wechat' in cmdline or
-                    '微信开发者工具' in cmdline):
-                    devtools_processes.append(proc.info)
-                    
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
+        devtools_processes = DevToolsProcessFinder().find_all()
         
         if devtools_processes:
             print(f"   ✅ 找到 {len(devtools_processes)} 个相关进程:")
@@ -75,21 +68,9 @@ class PWordDebugAssistant:
         """检查调试端口"""
         print("\n🔌 调试端口检查:")
         
-        import socket
-        debug_ports = [9222, 9223, 9224, 9225]
-        active_ports = []
-        
-        for port in debug_ports:
-            try:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(1)
-                result = sock.connect_ex(('127.0.0.1', port))
-                if result == 0:
-                    active_ports.append(port)
-                    print(f"   ✅ 端口 {port} 活跃")
-                sock.close()
-            except Exception:
-                pass
+        active_ports = open_ports(candidate_ports())
+        for port in active_ports:
+            print(f"   ✅ 端口 {port} 活跃")
         
         if not active_ports:
             print("   ⚠️ 未发现调试端口")
@@ -102,29 +83,7 @@ class PWordDebugAssistant:
         """检查控制台日志输出"""
         print("\n📝 项目代码中的日志检查:")
         
-        js_files = []
-        for root, dirs, files in os.walk(os.path.join(self.project_path, "miniprogram")):
-            for file in files:
-                if file.endswith('.js'):
-                    js_files.append(os.path.join(root, file))
-        
-        console_logs = []
-        for js_file in js_files:
-            try:
-                with open(js_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    lines = content.split('\n')
-                    
-                for i, line in enumerate(lines):
-                    if 'console.' in line and any(keyword in line.lower() for keyword in ['error', 'warn', 'log']):
-                        console_logs.append({
-                            'file': os.path.relpath(js_file, self.project_path),
-                            'line': i + 1,
-                            'content': line.strip()
-                        })
-                        
-            except Exception as e:
-                continue
+        console_logs = console_calls(self.project_files())
         
         if console_logs:
             print(f"   ✅ 找到 {len(console_logs)} 个日志输出点:")
@@ -145,15 +104,14 @@ class PWordDebugAssistant:
             "miniprogram/pages/demo/demo.json"
         ]
         
+        files = self.project_files()
         for json_file in json_files:
-            full_path = os.path.join(self.project_path, json_file)
-            if os.path.exists(full_path):
-                try:
-                    with open(full_path, 'r', encoding='utf-8') as f:
-                        json.load(f)
+            if json_file in files:
+                error = files[json_file]['json_error']
+                if error is None:
                     print(f"   ✅ {json_file} - JSON格式正确")
-                except json.JSONDecodeError as e:
-                    print(f"   ❌ {json_file} - JSON格式错误: {e}")
+                else:
+                    print(f"   ❌ {json_file} - JSON格式错误: {error}")
                     self.issues.append(f"JSON格式错误: {json_file}")
                     self.fixes.append(f"修复{json_file}的JSON格式")
             else:
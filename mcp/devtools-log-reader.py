@@ -9,66 +9,47 @@ import sys
 import json
 import psutil
 import subprocess
+import time
 from datetime import datetime
 from pathlib import Path
+from devtools_probe import EXTRA_PORTS, DevToolsProcessFinder, candidate_ports, scan_ports
+from devtools_logs import (LogAggregator, LogFollower, LogIndex, find_log_files, format_record,
+                           parse_log_line, parse_time_spec, tail_records)
+
+# 关注的日志关键字
+LOG_KEYWORDS = ['error', 'warn', 'console', 'debug', 'p-word']
+# 每个日志文件最多从末尾向前扫描的字节数
+TAIL_SCAN_BYTES = 8 * 1024 * 1024
+
+def is_relevant_line(line):
+    """是否为关注的日志行"""
+    lowered = line.lower()
+    return any(keyword in lowered for keyword in LOG_KEYWORDS)
 
 class WeChatDevToolsLogReader:
     """微信开发者工具日志读取器"""
     
     def __init__(self):
         self.devtools_process = None
+        self.process_finder = DevToolsProcessFinder(attrs=('pid', 'name', 'cmdline', 'cwd'))
         self.log_files = []
+        # 已读取日志的级别/模块统计
+        self.aggregator = LogAggregator()
         
     def find_devtools_process(self):
         """查找微信开发者工具进程"""
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline', 'cwd']):
-            try:
-                process_name = proc.info['name'].lower()
-                cmdline = ' '.join(proc.info['cmdline'] or []).lower()
-                
-                if any(keyword in process_name for keyword in ['wechatdevtools', 'wechat', 'devtools']) or \
-                   any(keyword in cmdline for keyword in ['微信开发者工具', 'wechatdevtools', 'wechat']):
-                    return proc.info
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                continue
-        return None
+        try:
+            return self.process_finder.find()
+        except psutil.AccessDenied:
+            return None
     
     def find_log_files(self):
         """查找日志文件"""
-        possible_paths = [
-            # macOS
-            os.path.expanduser("~/Library/Application Support/微信开发者工具/Default/logs"),
-            os.path.expanduser("~/Library/Application Support/wechatdevtools/Default/logs"),
-            os.path.expanduser("~/Library/Logs/微信开发者工具"),
-            # 项目特定日志
-            "/Users/gongshenshen/KnowledgeBase/20_学习中/P-Word/.logs",
-            "/Users/gongshenshen/KnowledgeBase/20_学习中/P-Word/logs",
-        ]
-        
-        log_files = []
-        for path in possible_paths:
-            if os.path.exists(path):
-                for root, dirs, files in os.walk(path):
-                    for file in files:
-                        if file.endswith(('.log', '.txt')) and any(keyword in file.lower() for keyword in ['console', 'debug', 'error', 'main']):
-                            log_files.append(os.path.join(root, file))
-        
-        return log_files
+        return find_log_files()
     
     def check_debug_ports(self):
         """检查调试端口"""
-        import socket
-        ports_status = {}
-        common_ports = [9222, 9223, 9224, 9225, 8080, 3000]
-        
-        for port in common_ports:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(1)
-            result = sock.connect_ex(('localhost', port))
-            ports_status[port] = result == 0
-            sock.close()
-            
-        return ports_status
+        return scan_ports(candidate_ports() + EXTRA_PORTS)
     
     def get_console_logs_via_cli(self):
         """通过命令行接口获取日志"""
@@ -108,19 +89,21 @@ class WeChatDevToolsLogReader:
         all_logs = []
         for log_file in log_files[:3]:  # 只读取最新的3个文件
             try:
-                with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
-                    lines = f.readlines()
-                    
-                # 获取最新的几行
-                recent_lines = lines[-limit:] if len(lines) > limit else lines
-                
-                for line in recent_lines:
-                    if line.strip() and any(keyword in line.lower() for keyword in ['error', 'warn', 'console', 'debug', 'p-word']):
-                        all_logs.append({
-                            'file': os.path.basename(log_file),
-                            'content': line.strip(),
-                            'timestamp': datetime.now().isoformat()
-                        })
+                name = os.path.basename(log_file)
+                # 从文件末尾按块反向读取，先切分成记录再按关键字筛选，只取最新的匹配记录
+                recent = tail_records(log_file, limit,
+                                      predicate=lambda record: is_relevant_line(format_record(record)),
+                                      source=name, max_scan_bytes=TAIL_SCAN_BYTES)
+                records = self.aggregator.consume(recent)
+                for record in records:
+                    when = datetime.fromtimestamp(record.time) if record.time else datetime.now()
+                    all_logs.append({
+                        'file': name,
+                        'content': format_record(record).strip(),
+                        'level': record.level,
+                        'module': record.module,
+                        'timestamp': when.isoformat()
+                    })
                         
             except Exception as e:
                 all_logs.append({
@@ -131,10 +114,73 @@ class WeChatDevToolsLogReader:
         
         return all_logs[-limit:] if len(all_logs) > limit else all_logs
 
+def follow_logs(reader):
+    """跟踪模式：持续输出日志文件新增的关注行"""
+    log_files = reader.find_log_files()
+    if not log_files:
+        print("⚠️ 未找到日志文件")
+        return
+    
+    print(f"👀 正在跟踪 {len(log_files)} 个日志文件 (Ctrl+C 退出)")
+    follower = LogFollower(log_files)
+    try:
+        for path, line in follower.follow(predicate=is_relevant_line):
+            record = parse_log_line(line, source=os.path.basename(path))
+            print(f"[{os.path.basename(path)}] {format_record(record) if record else line.strip()}")
+    except KeyboardInterrupt:
+        print("\n👋 已停止跟踪，读取位置已保存")
+
+def query_logs(argv):
+    """查询模式：增量导入日志索引后按条件查询"""
+    import argparse
+    parser = argparse.ArgumentParser(prog='devtools-log-reader.py query', description="查询日志历史")
+    parser.add_argument('text', nargs='?', default='', help="全文检索关键字")
+    parser.add_argument('--level', default='', help="日志级别，如 error")
+    parser.add_argument('--module', default='', help="模块名")
+    parser.add_argument('--since', default='', help="起始时间，如 2h、7d 或 2025-06-20T10:00")
+    parser.add_argument('--until', default='', help="结束时间")
+    parser.add_argument('--limit', type=int, default=50, help="最多返回条数")
+    args = parser.parse_args(argv)
+    
+    index = LogIndex()
+    try:
+        imported = index.ingest()
+        start = time.perf_counter()
+        entries = index.query(level=args.level, module=args.module,
+                              since=parse_time_spec(args.since), until=parse_time_spec(args.until),
+                              text=args.text, limit=args.limit)
+        elapsed = (time.perf_counter() - start) * 1000
+    finally:
+        index.close()
+    
+    print(f"📥 新导入 {imported} 条日志，查询耗时 {elapsed:.1f}ms，命中 {len(entries)} 条:")
+    for entry in entries:
+        print(format_indexed_entry(entry))
+
+def format_indexed_entry(entry):
+    """格式化一条索引日志"""
+    when = datetime.fromtimestamp(entry['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
+    module = f" [{entry['module']}]" if entry['module'] else ''
+    return f"[{when}] [{entry['level'].upper()}]{module} {entry['message']} ({entry['file']})"
+
 def main():
     """主函数"""
     reader = WeChatDevToolsLogReader()
     
+    if len(sys.argv) > 1 and sys.argv[1] == 'follow':
+        follow_logs(reader)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'index':
+        index = LogIndex()
+        try:
+            print(f"📥 新导入 {index.ingest(reader.find_log_files())} 条日志")
+        finally:
+            index.close()
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'query':
+        query_logs(sys.argv[2:])
+        return
+    
     print("🔍 微信开发者工具调试信息读取器")
     print("=" * 50)
     
@@ -177,6 +223,11 @@ def main():
     if logs:
         for log in logs:
             print(f"[{log['file']}] {log['content']}")
+        summary = reader.aggregator.summary()
+        print(f"   按级别: {summary['by_level']}")
+        modules = {module: count for module, count in summary['by_module'].items() if module}
+        if modules:
+            print(f"   按模块: {modules}")
     else:
         print("📝 暂无相关日志")
     
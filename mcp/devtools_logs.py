@@ -0,0 +1,941 @@
+#!/usr/bin/env python3
+"""
+微信开发者工具日志文件工具集
+只使用Python内置库，供日志读取器和MCP服务器共用
+"""
+
+import heapq
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from lazy_import import lazy_import
+
+# 只有日志索引用到，打开索引时才加载
+sqlite3 = lazy_import('sqlite3')
+
+# 反向读取时每块的大小
+BLOCK_SIZE = 64 * 1024
+
+
+def iter_lines_reversed(path: str, block_size: int = BLOCK_SIZE,
+                        max_scan_bytes: Optional[int] = None):
+    """从文件末尾按块向前读取，逐行倒序产出(bytes，不含换行符)
+
+    内存占用只与块大小(和单行长度)有关，与文件大小无关；
+    max_scan_bytes限制最多向前扫描的字节数
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        limit = 0 if max_scan_bytes is None else max(0, position - max_scan_bytes)
+        remainder = b''
+        first_block = True
+
+        while position > limit:
+            read_size = min(block_size, position - limit)
+            position -= read_size
+            f.seek(position)
+            block = f.read(read_size) + remainder
+            lines = block.split(b'\n')
+            # 第一段可能是不完整的行，留到下一块拼接
+            remainder = lines[0]
+            if first_block and lines[-1] == b'':
+                # 文件以换行结尾
+                lines.pop()
+            first_block = False
+            for line in reversed(lines[1:]):
+                yield line
+
+        # 到达文件开头时剩余部分是完整的第一行；扫描被截断时丢弃
+        if position == 0 and remainder:
+            yield remainder
+
+
+# 跟踪模式下保存各文件读取位置的位置
+OFFSETS_PATH = os.path.expanduser(os.path.join('~', '.pword-cache', 'log-offsets.json'))
+
+
+class _Inotify:
+    """基于ctypes的最小inotify封装，只用作“目录有变化”的唤醒信号"""
+
+    IN_MODIFY = 0x002
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    def __init__(self, directories):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1失败")
+        mask = self.IN_MODIFY | self.IN_CREATE | self.IN_DELETE | self.IN_MOVED_FROM | self.IN_MOVED_TO
+        for directory in directories:
+            libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+
+    def wait(self, timeout: float) -> bool:
+        """等待变化，返回是否有事件"""
+        import select
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            # 事件内容不关心，读空即可
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class LogFollower:
+    """持续跟踪日志文件新增内容
+
+    处理轮转(inode变化)和截断(文件变小)，并持久化每个文件的读取位置，
+    重启后从上次位置继续而不必重新扫描
+    """
+
+    def __init__(self, paths: List[str], state_path: Optional[str] = OFFSETS_PATH,
+                 poll_interval: float = 1.0, start_at_end: bool = True):
+        self.paths = list(paths)
+        self.state_path = state_path
+        self.poll_interval = poll_interval
+        self.start_at_end = start_at_end
+        # path -> (文件对象, inode, 未完成的行)
+        self._files = {}
+        self.offsets = self._load_offsets()
+
+    def _load_offsets(self):
+        if not self.state_path:
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_offsets(self):
+        if not self.state_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            tmp_path = self.state_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.offsets, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError:
+            pass
+
+    def _open(self, path: str, from_start: bool = False):
+        """打开文件并定位到上次读取的位置"""
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            return None
+        st = os.fstat(f.fileno())
+        saved = self.offsets.get(path)
+        if saved and saved.get('inode') == st.st_ino and saved.get('offset', 0) <= st.st_size:
+            f.seek(saved['offset'])
+        elif saved is None and self.start_at_end and not from_start:
+            f.seek(0, os.SEEK_END)
+        # inode变化或文件被截断：从头读取
+        self._files[path] = (f, st.st_ino, b'')
+        return self._files[path]
+
+    def _drain(self, path: str, f, inode: int, partial: bytes) -> List[str]:
+        """读到文件末尾，只返回完整的行"""
+        data = partial + f.read()
+        lines = data.split(b'\n')
+        partial = lines.pop()
+        self._files[path] = (f, inode, partial)
+        self.offsets[path] = {'inode': inode, 'offset': f.tell() - len(partial)}
+        return [line.decode('utf-8', errors='ignore').rstrip('\r') for line in lines]
+
+    def read_new(self) -> List[tuple]:
+        """读取所有文件的新增行，返回[(path, line)]"""
+        results = []
+        for path in self.paths:
+            current = self._files.get(path) or self._open(path)
+            if current is None:
+                continue
+            f, inode, partial = current
+            try:
+                st = os.stat(path)
+            except OSError:
+                st = None
+
+            if st is not None and st.st_ino != inode:
+                # 文件被轮转：先读完旧文件，再切换到新文件
+                results.extend((path, line) for line in self._drain(path, f, inode, partial))
+                f.close()
+                self.offsets.pop(path, None)
+                current = self._open(path, from_start=True)
+                if current is None:
+                    continue
+                f, inode, partial = current
+            elif st is not None and st.st_size < f.tell():
+                # 文件被截断
+                f.seek(0)
+                partial = b''
+
+            results.extend((path, line) for line in self._drain(path, f, inode, partial))
+
+        if results:
+            self.save_offsets()
+        return results
+
+    def follow(self, predicate: Optional[Callable[[str], bool]] = None):
+        """持续产出新增行(path, line)；Linux用inotify，其他系统轮询"""
+        directories = sorted({os.path.dirname(os.path.abspath(p)) for p in self.paths})
+        try:
+            watcher = _Inotify(directories)
+        except (OSError, AttributeError):
+            watcher = None
+
+        try:
+            while True:
+                for path, line in self.read_new():
+                    if predicate is None or predicate(line):
+                        yield path, line
+                if watcher is not None:
+                    # 超时兜底，防止漏掉事件
+                    watcher.wait(self.poll_interval * 5)
+                else:
+                    time.sleep(self.poll_interval)
+        finally:
+            if watcher is not None:
+                watcher.close()
+            self.close()
+
+    def close(self):
+        for f, _, _ in self._files.values():
+            f.close()
+        self._files.clear()
+        self.save_offsets()
+
+
+# 开发者工具日志目录
+LOG_DIRS = [
+    # macOS
+    os.path.expanduser("~/Library/Application Support/微信开发者工具/Default/logs"),
+    os.path.expanduser("~/Library/Application Support/wechatdevtools/Default/logs"),
+    os.path.expanduser("~/Library/Logs/微信开发者工具"),
+    # 项目特定日志
+    "/Users/gongshenshen/KnowledgeBase/20_学习中/P-Word/.logs",
+    "/Users/gongshenshen/KnowledgeBase/20_学习中/P-Word/logs",
+]
+LOG_FILE_KEYWORDS = ('console', 'debug', 'error', 'main')
+
+
+def find_log_files(log_dirs: List[str] = LOG_DIRS) -> List[str]:
+    """查找开发者工具日志文件"""
+    log_files = []
+    for path in log_dirs:
+        if os.path.exists(path):
+            for root, dirs, files in os.walk(path):
+                for file in files:
+                    if file.endswith(('.log', '.txt')) and any(keyword in file.lower() for keyword in LOG_FILE_KEYWORDS):
+                        log_files.append(os.path.join(root, file))
+    return log_files
+
+
+# 日志行格式: [2025-06-20 10:11:12.345] [info] ... 或 LogService.formatMessage的 [10:11:12.345] [ERROR] [module] ...
+LOG_LINE_PATTERN = re.compile(
+    r'^\[(?:(?P<date>\d{4}-\d{2}-\d{2})[ T])?(?P<time>\d{2}:\d{2}:\d{2}(?:\.\d{1,6})?)\]\s*'
+    r'(?:\[(?P<level>[A-Za-z]+)\]\s*)?'
+    r'(?:\[(?P<module>[^\]]+)\]\s*)?'
+    r'(?P<message>.*)$',
+    re.DOTALL
+)
+
+
+class LogRecord(NamedTuple):
+    """结构化日志记录"""
+    time: Optional[float]      # 时间戳(秒)
+    level: str                 # 小写级别，如 error
+    module: str                # LogService模块名，没有时为空串
+    message: str
+    payload: Any = None        # 附加数据(控制台事件的其余参数)
+    source: str = ''           # 来源文件名或调试目标
+
+
+# CDP与LogService级别名称不一致，统一为LogService的写法
+LEVEL_ALIASES = {
+    'warning': 'warn',
+    'verbose': 'debug',
+    'assert': 'error',
+}
+
+
+def normalize_level(level: str) -> str:
+    """小写并统一别名，如CDP的 warning -> warn"""
+    level = level.lower()
+    return sys.intern(LEVEL_ALIASES.get(level, level))
+
+
+_midnights = {}
+
+
+def _to_timestamp(date: str, clock: str, utc: bool = False) -> Optional[float]:
+    """'2025-06-20' + '10:11:12.345' 转为时间戳，utc为False时按本地时间，同一天的零点只计算一次"""
+    midnight = _midnights.get((date, utc))
+    if midnight is None:
+        try:
+            day = datetime.strptime(date, '%Y-%m-%d')
+        except ValueError:
+            return None
+        midnight = (day.replace(tzinfo=timezone.utc) if utc else day).timestamp()
+        _midnights[(date, utc)] = midnight
+    hours, minutes, seconds = clock.split(':')
+    return midnight + int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+# 相邻两行只有时间的日志时间倒退超过这么多秒，认为跨过了UTC零点
+ROLLOVER_SECONDS = 12 * 3600
+
+
+def _clock_seconds(clock: str) -> float:
+    hours, minutes, seconds = clock.split(':')
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def _shift_date(date: str, days: int) -> str:
+    return (datetime.strptime(date, '%Y-%m-%d') + timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+class ClockDates:
+    """推算只有时间的日志行(UTC)所在的日期
+
+    日志按时间先后写入，时间比上一行倒退超过半天时进入下一天；
+    backwards为True时按从文件末尾往前的顺序推算
+    """
+
+    def __init__(self, date: str, clock: Optional[float] = None, backwards: bool = False):
+        self.date = date
+        # 上一行的时间(当天的秒数)
+        self.clock = clock
+        self.backwards = backwards
+
+    @classmethod
+    def ending_at(cls, mtime: float) -> 'ClockDates':
+        """从文件修改时间往前推算，用于倒序读取"""
+        moment = datetime.fromtimestamp(mtime, timezone.utc)
+        clock = moment.hour * 3600 + moment.minute * 60 + moment.second + moment.microsecond / 1e6
+        return cls(moment.strftime('%Y-%m-%d'), clock, backwards=True)
+
+    def advance(self, seconds: float) -> str:
+        if self.clock is not None:
+            jump = seconds - self.clock if self.backwards else self.clock - seconds
+            if jump > ROLLOVER_SECONDS:
+                self.date = _shift_date(self.date, -1 if self.backwards else 1)
+        self.clock = seconds
+        return self.date
+
+    def date_for(self, clock: str) -> str:
+        return self.advance(_clock_seconds(clock))
+
+
+def first_clock_date(lines: Iterable[str], mtime: float) -> Optional[str]:
+    """从文件修改时间往回推算第一行只有时间的日志的UTC日期，没有这样的行时返回None"""
+    # 先正向统计跨过零点的次数和最后一行的时间
+    forward = ClockDates('1970-01-01')
+    for line in lines:
+        match = LOG_LINE_PATTERN.match(line)
+        if match and not match.group('date'):
+            forward.date_for(match.group('time'))
+    if forward.clock is None:
+        return None
+    days = (datetime.strptime(forward.date, '%Y-%m-%d') - datetime(1970, 1, 1)).days
+    last_date = ClockDates.ending_at(mtime).advance(forward.clock)
+    return _shift_date(last_date, -days)
+
+
+def parse_log_line(line: str, default_date: Optional[str] = None, source: str = '',
+                   dates: Optional[ClockDates] = None) -> Optional[LogRecord]:
+    """解析一行日志；不是日志行开头(如堆栈续行)时返回None
+
+    带日期的时间按本地时间解析；只有时间时是LogService用toISOString()生成的UTC时间，
+    日期由dates推算，没有dates时取default_date(应为UTC日期)
+    """
+    match = LOG_LINE_PATTERN.match(line)
+    if not match:
+        return None
+    if match.group('date'):
+        timestamp = _to_timestamp(match.group('date'), match.group('time'))
+    elif dates is not None:
+        timestamp = _to_timestamp(dates.date_for(match.group('time')), match.group('time'), utc=True)
+    elif default_date:
+        timestamp = _to_timestamp(default_date, match.group('time'), utc=True)
+    else:
+        timestamp = None
+    level = normalize_level(match.group('level') or 'log')
+    module = sys.intern(match.group('module') or '')
+    return LogRecord(timestamp, level, module, match.group('message'), None, source)
+
+
+def parse_lines(lines: Iterable[str], default_date: Optional[str] = None, source: str = '',
+                fallback_time: Optional[float] = None,
+                dates: Optional[ClockDates] = None) -> Iterator[LogRecord]:
+    """把日志行流式解析为LogRecord，续行(如堆栈)并入上一条
+
+    只有时间的行从default_date(或dates)开始推算日期，时间倒退时进入下一天
+    """
+    if dates is None and default_date:
+        dates = ClockDates(default_date)
+    pending = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            continue
+        record = parse_log_line(line, source=source, dates=dates)
+        if record is None:
+            if pending is not None:
+                pending = pending._replace(message=pending.message + '\n' + line)
+                continue
+            record = LogRecord(fallback_time, 'log', '', line, None, source)
+        if pending is not None:
+            yield pending
+        pending = record
+    if pending is not None:
+        yield pending
+
+
+def tail_records(path: str, limit: int = 20,
+                 predicate: Optional[Callable[[LogRecord], bool]] = None,
+                 source: str = '', block_size: int = BLOCK_SIZE,
+                 max_scan_bytes: Optional[int] = None) -> List[LogRecord]:
+    """从文件末尾向前解析，返回最后limit条满足predicate的记录(按原顺序)
+
+    先按行首切分出完整的记录(续行并入所属记录)再筛选，被筛掉的行不会影响记录的边界；
+    只有时间的行从文件修改时间往前推算日期
+    """
+    if limit <= 0:
+        return []
+    dates = ClockDates.ending_at(os.path.getmtime(path))
+    matched = []
+    # 倒序读到的续行，遇到所属记录的首行时并入
+    continuation = []
+
+    def accept(record: LogRecord) -> bool:
+        if predicate is None or predicate(record):
+            matched.append(record)
+        return len(matched) >= limit
+
+    for raw in iter_lines_reversed(path, block_size, max_scan_bytes):
+        line = raw.decode('utf-8', errors='ignore').rstrip('\r')
+        if not line.strip():
+            continue
+        record = parse_log_line(line, source=source, dates=dates)
+        if record is None:
+            continuation.append(line)
+            continue
+        if continuation:
+            continuation.reverse()
+            record = record._replace(message='\n'.join([record.message] + continuation))
+            continuation = []
+        if accept(record):
+            break
+    else:
+        # 文件开头(或扫描范围开头)没有所属记录的行，与正向解析一样合为一条
+        if continuation:
+            continuation.reverse()
+            accept(LogRecord(None, 'log', '', '\n'.join(continuation), None, source))
+    matched.reverse()
+    return matched
+
+
+def _remote_object_text(arg: Dict) -> str:
+    """CDP RemoteObject的简短文本"""
+    if 'value' in arg:
+        return str(arg['value'])
+    return arg.get('description', arg.get('type', ''))
+
+
+class ConsoleRecord:
+    """CDP控制台事件的紧凑记录，字段与LogRecord一致
+
+    级别、模块、来源使用驻留字符串；多个参数只保存各自的文本，
+    message在访问时才拼接；原始事件JSON仅在需要时保留
+    """
+
+    __slots__ = ('time', 'level', 'module', 'source', '_parts', '_extra', 'raw')
+
+    def __init__(self, time: Optional[float], level: str, module: str, parts,
+                 extra: Tuple[str, ...] = (), source: str = '', raw: Optional[str] = None):
+        self.time = time
+        self.level = sys.intern(level)
+        self.module = sys.intern(module)
+        self.source = sys.intern(source)
+        # 单个参数直接保存字符串，省去元组
+        self._parts = parts[0] if len(parts) == 1 else tuple(parts)
+        self._extra = tuple(extra) if extra else None
+        self.raw = raw
+
+    @property
+    def message(self) -> str:
+        parts = self._parts
+        return parts if isinstance(parts, str) else ' '.join(parts)
+
+    @property
+    def payload(self) -> Optional[List[str]]:
+        return list(self._extra) if self._extra else None
+
+    def raw_event(self) -> Optional[Dict]:
+        """原始CDP事件(未保留时为None)"""
+        return json.loads(self.raw) if self.raw is not None else None
+
+    def nbytes(self) -> int:
+        """估算占用的内存(驻留字符串不计入)"""
+        size = sys.getsizeof(self) + sys.getsizeof(self.time)
+        for value in (self._parts, self._extra):
+            if isinstance(value, tuple):
+                size += sys.getsizeof(value) + sum(sys.getsizeof(part) for part in value)
+            elif value is not None:
+                size += sys.getsizeof(value)
+        if self.raw is not None:
+            size += sys.getsizeof(self.raw)
+        return size
+
+    def __repr__(self):
+        return (f"ConsoleRecord(time={self.time!r}, level={self.level!r}, module={self.module!r}, "
+                f"message={self.message!r}, source={self.source!r})")
+
+
+def parse_console_event(data: Dict, source: str = '', raw: Optional[str] = None) -> Optional[ConsoleRecord]:
+    """把CDP控制台事件解析为ConsoleRecord，非控制台事件返回None
+
+    raw为事件的原始JSON文本，传入时随记录保留
+    """
+    method = data.get('method')
+    params = data.get('params', {})
+    if method == 'Runtime.consoleAPICalled':
+        args = params.get('args', [])
+        texts = [_remote_object_text(arg) for arg in args]
+        level = params.get('type', 'log')
+        timestamp = params.get('timestamp')
+    elif method == 'Console.messageAdded':
+        message = params.get('message', {})
+        texts = [message.get('text', '')]
+        level = message.get('level', 'log')
+        timestamp = message.get('timestamp')
+    else:
+        return None
+
+    # CDP时间戳为毫秒
+    if timestamp and timestamp > 1e11:
+        timestamp = timestamp / 1000
+
+    # LogService输出的第一个参数带有 [时间] [级别] [模块] 前缀，其余参数是附加数据
+    first = texts[0] if texts else ''
+    match = LOG_LINE_PATTERN.match(first)
+    if match:
+        return ConsoleRecord(timestamp or None, normalize_level(match.group('level') or 'log'),
+                             match.group('module') or '', (match.group('message'),),
+                             texts[1:], source, raw)
+    return ConsoleRecord(timestamp or None, normalize_level(level), '', texts or [''], (), source, raw)
+
+
+def format_record(record: LogRecord, max_length: Optional[int] = None, with_source: bool = False) -> str:
+    """格式化为 [LEVEL] [module] message，with_source时在前面加上 <来源>"""
+    module = f" [{record.module}]" if record.module else ''
+    message = record.message if max_length is None else record.message[:max_length]
+    source = f"<{record.source}> " if with_source and record.source else ''
+    return f"{source}[{record.level.upper()}]{module} {message}"
+
+
+@lru_cache(maxsize=64)
+def compile_pattern(pattern: str):
+    """编译查询用的正则(相同的表达式只编译一次)"""
+    return re.compile(pattern)
+
+
+def record_filter(level: str = '', module: str = '', source: str = '',
+                  since: Optional[float] = None, until: Optional[float] = None,
+                  pattern: str = '') -> Callable[[LogRecord], bool]:
+    """把查询条件组合为一个判断函数
+
+    level可用逗号分隔多个级别，module精确匹配，source为来源子串(不区分大小写)，
+    pattern为在消息中搜索的正则；表达式无效时抛出re.error
+    """
+    levels = {normalize_level(part.strip()) for part in level.split(',') if part.strip()}
+    source = source.lower()
+    regex = compile_pattern(pattern) if pattern else None
+
+    def matches(record: LogRecord) -> bool:
+        if levels and record.level not in levels:
+            return False
+        if module and record.module != module:
+            return False
+        if source and source not in record.source.lower():
+            return False
+        if since is not None and (record.time is None or record.time < since):
+            return False
+        if until is not None and (record.time is None or record.time > until):
+            return False
+        if regex is not None and regex.search(record.message) is None:
+            return False
+        return True
+
+    return matches
+
+
+class LogAggregator:
+    """流式统计：按级别、模块、模块+级别计数，常量内存"""
+
+    def __init__(self):
+        self.total = 0
+        self.by_level = Counter()
+        self.by_module = Counter()
+        self.by_module_level = Counter()
+        self.first_time = None
+        self.last_time = None
+
+    def feed(self, record: LogRecord):
+        self.total += 1
+        self.by_level[record.level] += 1
+        self.by_module[record.module] += 1
+        self.by_module_level[(record.module, record.level)] += 1
+        if record.time is not None:
+            if self.first_time is None or record.time < self.first_time:
+                self.first_time = record.time
+            if self.last_time is None or record.time > self.last_time:
+                self.last_time = record.time
+
+    def consume(self, records: Iterable[LogRecord]) -> Iterator[LogRecord]:
+        """边统计边透传记录"""
+        for record in records:
+            self.feed(record)
+            yield record
+
+    def summary(self) -> Dict:
+        return {
+            'total': self.total,
+            'by_level': dict(self.by_level),
+            'by_module': dict(self.by_module),
+            'first_time': self.first_time,
+            'last_time': self.last_time,
+        }
+
+
+# 归并消息时视为可变部分的数字(含十六进制)
+NUMBER_PATTERN = re.compile(r'0x[0-9a-fA-F]+|\d+(?:\.\d+)?')
+# 分组中保留的示例消息长度
+SAMPLE_LENGTH = 200
+
+
+def message_template(message: str) -> str:
+    """消息中的数字替换为#，作为归并重复消息的模板"""
+    return NUMBER_PATTERN.sub('#', message)
+
+
+class MessageGroup:
+    """一组 级别+模块+消息模板 相同的记录"""
+
+    __slots__ = ('level', 'module', 'template', 'count', 'first_time', 'last_time', 'sample')
+
+    def __init__(self, level: str, module: str, template: str):
+        self.level = level
+        self.module = module
+        self.template = template
+        self.count = 0
+        self.first_time = None
+        self.last_time = None
+        # 最近一条消息原文
+        self.sample = ''
+
+    def add(self, record, newest: bool = True):
+        """计入一条记录；newest为False时(倒序遍历)不替换示例消息"""
+        self.count += 1
+        if record.time is not None:
+            if self.first_time is None or record.time < self.first_time:
+                self.first_time = record.time
+            if self.last_time is None or record.time > self.last_time:
+                self.last_time = record.time
+        if newest or not self.sample:
+            self.sample = record.message[:SAMPLE_LENGTH]
+
+    @property
+    def rate(self) -> Optional[float]:
+        """每秒条数(时间跨度为0时为None)"""
+        if self.first_time is None or self.last_time is None or self.last_time <= self.first_time:
+            return None
+        return self.count / (self.last_time - self.first_time)
+
+
+def _group_key(record) -> Tuple[str, str, str]:
+    return record.level, record.module, message_template(record.message)
+
+
+class MessageGroups:
+    """流式归并重复消息，每组常量内存；组数超过max_groups时淘汰最久未出现的组"""
+
+    def __init__(self, max_groups: int = 1000):
+        self.max_groups = max_groups
+        self._groups = OrderedDict()
+
+    def feed(self, record) -> MessageGroup:
+        key = _group_key(record)
+        group = self._groups.get(key)
+        if group is None:
+            group = MessageGroup(*key)
+            self._groups[key] = group
+            if len(self._groups) > self.max_groups:
+                self._groups.popitem(last=False)
+        else:
+            self._groups.move_to_end(key)
+        group.add(record)
+        return group
+
+    def top(self, limit: int = 10) -> List[MessageGroup]:
+        """出现次数最多的limit组"""
+        return heapq.nlargest(limit, self._groups.values(), key=lambda group: group.count)
+
+    def clear(self):
+        self._groups.clear()
+
+    def __len__(self):
+        return len(self._groups)
+
+
+def collapse_records(newest_first: Iterable, limit: int = 10, max_scan: int = 20000) -> List[MessageGroup]:
+    """从最新的记录往前归并，凑够limit组或扫描max_scan条后停止，按最后出现时间先后返回"""
+    groups = {}
+    for scanned, record in enumerate(newest_first):
+        if scanned >= max_scan:
+            break
+        key = _group_key(record)
+        group = groups.get(key)
+        if group is None:
+            if len(groups) >= limit:
+                break
+            group = groups[key] = MessageGroup(*key)
+        group.add(record, newest=False)
+    # 字典按首次遇到(即最后出现)的顺序，反转后为时间先后
+    return list(reversed(list(groups.values())))
+
+
+def format_group(group: MessageGroup, max_length: Optional[int] = None) -> str:
+    """格式化为 [LEVEL] [module] message ×次数 (首次-最后时间)"""
+    module = f" [{group.module}]" if group.module else ''
+    message = group.sample if max_length is None else group.sample[:max_length]
+    text = f"[{group.level.upper()}]{module} {message}"
+    if group.count > 1:
+        text += f" ×{group.count}"
+        if group.first_time is not None:
+            first = datetime.fromtimestamp(group.first_time).strftime('%H:%M:%S')
+            last = datetime.fromtimestamp(group.last_time).strftime('%H:%M:%S')
+            text += f" ({first}-{last})"
+    return text
+
+
+def parse_time_spec(spec: str) -> Optional[float]:
+    """解析时间参数：'2h'/'30m'/'7d' 表示多久之前，或 '2025-06-20 10:00' 形式的时间"""
+    spec = (spec or '').strip()
+    if not spec:
+        return None
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    if spec[-1] in units and spec[:-1].isdigit():
+        return time.time() - int(spec[:-1]) * units[spec[-1]]
+    return datetime.fromisoformat(spec).timestamp()
+
+
+# 日志索引数据库位置
+INDEX_PATH = os.path.expanduser(os.path.join('~', '.pword-cache', 'log-index.db'))
+# 索引格式或解析规则变化时递增，旧索引整体重建
+INDEX_VERSION = 2
+# 导入时每次读取的字节数和每个事务写入的条数
+INGEST_CHUNK_SIZE = 1024 * 1024
+INGEST_BATCH_SIZE = 5000
+
+
+def read_complete_lines(f, position: Dict) -> Iterator[str]:
+    """从f的当前位置按块读取，只产出完整的行，末尾未写完的行留到下次
+
+    position['start']/['end']随之更新为最近产出的一行的起止位置，读完后position['done']为True
+    """
+    tail = b''
+    while True:
+        chunk = f.read(INGEST_CHUNK_SIZE)
+        if not chunk:
+            break
+        data = tail + chunk
+        end = data.rfind(b'\n') + 1
+        tail = data[end:]
+        if end == 0:
+            continue
+        for raw in data[:end - 1].split(b'\n'):
+            position['start'] = position['end']
+            position['end'] += len(raw) + 1
+            yield raw.decode('utf-8', errors='ignore')
+    position['done'] = True
+
+
+class LogIndex:
+    """开发者工具日志的本地SQLite索引
+
+    增量导入(按inode+字节位置续读)，支持按级别、模块、时间范围和全文(FTS5)查询
+    """
+
+    def __init__(self, db_path: str = INDEX_PATH):
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.has_fts = self._create_schema()
+
+    def _create_schema(self) -> bool:
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] != INDEX_VERSION:
+            self.conn.executescript('''
+                DROP TABLE IF EXISTS entries_fts;
+                DROP TABLE IF EXISTS entries;
+                DROP TABLE IF EXISTS files;
+            ''')
+            self.conn.execute(f'PRAGMA user_version = {INDEX_VERSION}')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY, inode INTEGER, offset INTEGER, date TEXT, clock REAL
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY, ts REAL, level TEXT, module TEXT, file TEXT, message TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_ts ON entries(ts);
+            CREATE INDEX IF NOT EXISTS idx_entries_level_ts ON entries(level, ts);
+            CREATE INDEX IF NOT EXISTS idx_entries_module_ts ON entries(module, ts);
+        ''')
+        try:
+            self.conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts "
+                "USING fts5(message, content='entries', content_rowid='id')"
+            )
+            return True
+        except sqlite3.OperationalError:
+            # SQLite未编译FTS5时退化为LIKE查询
+            return False
+
+    def ingest_file(self, path: str) -> int:
+        """导入单个文件的新增内容，返回导入的条数"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return 0
+        row = self.conn.execute('SELECT inode, offset, date, clock FROM files WHERE path = ?',
+                                (path,)).fetchone()
+        offset = 0
+        dates = None
+        if row and row[0] == st.st_ino and row[1] <= st.st_size:
+            offset = row[1]
+            if row[2]:
+                # 从上次读到的位置继续推算日期
+                dates = ClockDates(row[2], row[3])
+        if offset == st.st_size:
+            return 0
+
+        name = os.path.basename(path)
+        with open(path, 'rb') as f:
+            if dates is None:
+                # 先扫描一遍未读部分，从修改时间往回推算第一行的日期
+                f.seek(offset)
+                first_date = first_clock_date(read_complete_lines(f, {'end': offset}), st.st_mtime)
+                dates = ClockDates(first_date or datetime.fromtimestamp(st.st_mtime, timezone.utc).strftime('%Y-%m-%d'))
+
+            # 最近读入的一行的起止位置；读完全部完整的行后done为True
+            position = {'start': offset, 'end': offset, 'done': False}
+
+            def committed_offset() -> int:
+                # 记录在读到下一条的首行时才产出，下一条从该行开始；读完后到最后一个完整行为止。
+                # 推算日期的状态已包含该行，续读时重新解析它不会再次跨天
+                return position['end'] if position['done'] else position['start']
+
+            count = 0
+            rows = []
+            f.seek(offset)
+            for record in parse_lines(read_complete_lines(f, position), source=name,
+                                      fallback_time=st.st_mtime, dates=dates):
+                rows.append((record.time, record.level, record.module, name, record.message))
+                if len(rows) >= INGEST_BATCH_SIZE:
+                    self._insert_batch(path, st.st_ino, rows, committed_offset(), dates)
+                    count += len(rows)
+                    rows = []
+        if position['end'] > offset:
+            self._insert_batch(path, st.st_ino, rows, committed_offset(), dates)
+            count += len(rows)
+        return count
+
+    def _insert_batch(self, path: str, inode: int, rows: List[Tuple], offset: int, dates: ClockDates):
+        """在一个事务中写入一批记录并保存文件的续读位置"""
+        with self.conn:
+            first_id = self.conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM entries').fetchone()[0]
+            ids = range(first_id, first_id + len(rows))
+            self.conn.executemany(
+                'INSERT INTO entries (id, ts, level, module, file, message) VALUES (?, ?, ?, ?, ?, ?)',
+                [(row_id, *row) for row_id, row in zip(ids, rows)])
+            if self.has_fts:
+                self.conn.executemany('INSERT INTO entries_fts (rowid, message) VALUES (?, ?)',
+                                      [(row_id, row[4]) for row_id, row in zip(ids, rows)])
+            self.conn.execute(
+                'INSERT OR REPLACE INTO files (path, inode, offset, date, clock) VALUES (?, ?, ?, ?, ?)',
+                (path, inode, offset, dates.date if dates.clock is not None else None, dates.clock))
+
+    def ingest(self, paths: Optional[List[str]] = None) -> int:
+        """增量导入日志文件，默认导入自动发现的文件"""
+        if paths is None:
+            paths = find_log_files()
+        return sum(self.ingest_file(path) for path in paths)
+
+    def query(self, level: str = '', module: str = '', since: Optional[float] = None,
+              until: Optional[float] = None, text: str = '', limit: int = 50) -> List[Dict]:
+        """按条件查询，返回最新的limit条(按时间先后排列)"""
+        conditions = []
+        params = []
+        if level:
+            conditions.append('level = ?')
+            params.append(normalize_level(level))
+        if module:
+            conditions.append('module = ?')
+            params.append(module)
+        if since is not None:
+            conditions.append('ts >= ?')
+            params.append(since)
+        if until is not None:
+            conditions.append('ts <= ?')
+            params.append(until)
+        if text:
+            if self.has_fts:
+                conditions.append('id IN (SELECT rowid FROM entries_fts WHERE entries_fts MATCH ?)')
+                # 作为短语匹配，避免用户输入被当作FTS语法
+                params.append('"' + text.replace('"', '""') + '"')
+            else:
+                conditions.append('message LIKE ?')
+                params.append(f'%{text}%')
+
+        sql = 'SELECT ts, level, module, file, message FROM entries'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY ts DESC, id DESC LIMIT ?'
+        params.append(limit)
+
+        rows = self.conn.execute(sql, params).fetchall()
+        return [
+            {'timestamp': ts, 'level': lvl, 'module': mod, 'file': name, 'message': message}
+            for ts, lvl, mod, name, message in reversed(rows)
+        ]
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+微信开发者工具探测工具集
+只使用Python内置库(进程查找器需要psutil)，供各调试脚本共用
+"""
+
+import asyncio
+import errno
+import os
+import re
+import selectors
+import socket
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+# Chrome调试器常用端口
+DEBUG_PORTS = [9222, 9223, 9224, 9225]
+# 调试端口之外可能的本地服务端口
+EXTRA_PORTS = [8080, 3000]
+
+# 开发者工具默认的用户数据目录(Chromium在其中写入DevToolsActivePort)
+PROFILE_DIRS = [
+    os.path.expanduser("~/Library/Application Support/微信开发者工具"),
+    os.path.expanduser("~/Library/Application Support/wechatwebdevtools"),
+    os.path.expanduser("~/Library/Application Support/wechatdevtools"),
+]
+
+
+def parse_port_spec(spec: str) -> List[int]:
+    """解析端口配置，如 "9222-9225,8080" """
+    ports = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            ports.extend(range(int(start), int(end) + 1))
+        else:
+            ports.append(int(part))
+    # 去重并保持顺序
+    return list(dict.fromkeys(ports))
+
+
+def candidate_ports(default: Iterable[int] = DEBUG_PORTS) -> List[int]:
+    """候选调试端口，可通过环境变量 PWORD_DEBUG_PORTS 覆盖"""
+    spec = os.environ.get('PWORD_DEBUG_PORTS')
+    if spec:
+        return parse_port_spec(spec)
+    return list(default)
+
+
+def scan_ports(ports: Iterable[int], host: str = '127.0.0.1',
+               timeout: float = 1.0) -> Dict[int, bool]:
+    """并发探测端口，所有端口共用一个总超时"""
+    ports = list(dict.fromkeys(ports))
+    status = {port: False for port in ports}
+    deadline = time.monotonic() + timeout
+    selector = selectors.DefaultSelector()
+    sockets = []
+
+    try:
+        for port in ports:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            sockets.append(sock)
+            result = sock.connect_ex((host, port))
+            if result == 0:
+                status[port] = True
+            elif result in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN):
+                selector.register(sock, selectors.EVENT_WRITE, port)
+
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, _ in selector.select(remaining):
+                selector.unregister(key.fileobj)
+                error = key.fileobj.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                status[key.data] = error == 0
+    finally:
+        selector.close()
+        for sock in sockets:
+            sock.close()
+
+    return status
+
+
+def open_ports(ports: Iterable[int], host: str = '127.0.0.1',
+               timeout: float = 1.0) -> List[int]:
+    """返回开启的端口(保持传入顺序)"""
+    return [port for port, active in scan_ports(ports, host, timeout).items() if active]
+
+
+def _flag_value(cmdline: List[str], flag: str) -> Optional[str]:
+    """从命令行参数中取出 --flag=value 或 --flag value 的值"""
+    for i, arg in enumerate(cmdline):
+        if arg.startswith(flag + '='):
+            return arg[len(flag) + 1:]
+        if arg == flag and i + 1 < len(cmdline):
+            return cmdline[i + 1]
+    return None
+
+
+def split_command_line(command: str) -> List[str]:
+    """把ps输出的、已用空格拼接的命令行按 " --" 切分为参数
+
+    无法还原原始argv，但 --flag=value 的值中的空格(如 Application Support)能够保留
+    """
+    return [arg.strip() for arg in re.split(r' (?=--)', command.strip()) if arg.strip()]
+
+
+def port_from_cmdline(cmdline: Optional[List[str]]) -> Optional[int]:
+    """从进程命令行读取 --remote-debugging-port"""
+    value = _flag_value(cmdline or [], '--remote-debugging-port')
+    if value and value.isdigit() and int(value) > 0:
+        return int(value)
+    return None
+
+
+def port_from_active_port_file(profile_dirs: Iterable[str] = PROFILE_DIRS) -> Optional[int]:
+    """读取Chromium写入的DevToolsActivePort文件(首行为端口号)"""
+    for profile_dir in profile_dirs:
+        try:
+            with open(os.path.join(profile_dir, 'DevToolsActivePort'), 'r') as f:
+                first_line = f.readline().strip()
+        except OSError:
+            continue
+        if first_line.isdigit():
+            return int(first_line)
+    return None
+
+
+def discover_debug_port(cmdline: Optional[List[str]] = None) -> Optional[int]:
+    """不做端口探测直接发现调试端口，找不到时返回None由调用方回退到探测"""
+    port = port_from_cmdline(cmdline)
+    if port:
+        return port
+
+    profile_dirs = list(PROFILE_DIRS)
+    user_data_dir = _flag_value(cmdline or [], '--user-data-dir')
+    if user_data_dir:
+        profile_dirs.insert(0, user_data_dir)
+
+    port = port_from_active_port_file(profile_dirs)
+    # 进程崩溃时文件可能残留，确认端口仍在监听
+    if port and scan_ports([port], timeout=0.2)[port]:
+        return port
+    return None
+
+
+# 开发者工具进程名关键字
+DEVTOOLS_PROCESS_KEYWORDS = ('wechatwebdevtools', 'wechatdevtools')
+# /proc/<pid>/comm 最多保留15个字符
+_COMM_LENGTH = 15
+
+
+def scan_proc_processes(keywords: Iterable[str] = DEVTOOLS_PROCESS_KEYWORDS,
+                        proc_root: str = '/proc') -> Optional[List[Dict]]:
+    """通过/proc查找进程：先读短小的comm，命中后才读cmdline
+
+    不fork子进程，也不生成整张进程表文本；非Linux系统返回None
+    """
+    if not os.path.isdir(proc_root):
+        return None
+
+    keywords = [keyword.lower() for keyword in keywords]
+    prefixes = [keyword[:_COMM_LENGTH] for keyword in keywords]
+    matches = []
+    for entry in os.listdir(proc_root):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'{proc_root}/{entry}/comm', 'rb') as f:
+                comm = f.read().decode('utf-8', 'replace').strip().lower()
+            if not any(prefix in comm for prefix in prefixes):
+                continue
+            with open(f'{proc_root}/{entry}/cmdline', 'rb') as f:
+                # 参数以\0分隔，按原样拆成argv，参数中的空格不受影响
+                cmdline = [arg.decode('utf-8', 'replace') for arg in f.read().split(b'\0') if arg]
+        except OSError:
+            # 进程已退出或无权限
+            continue
+        # comm可能被截断，用完整命令行确认
+        haystack = f"{comm} {' '.join(cmdline).lower()}"
+        if any(keyword in haystack for keyword in keywords):
+            matches.append({'pid': int(entry), 'name': comm, 'cmdline': cmdline})
+    return matches
+
+
+class DevToolsProcessFinder:
+    """微信开发者工具进程查找器(依赖psutil)
+
+    先只按进程名粗筛，命中候选后才读取命令行；找到后缓存PID，
+    之后用 pid_exists + 创建时间校验，避免每次扫描整个进程表
+    """
+
+    # 名称即可确认的关键字
+    NAME_KEYWORDS = ('wechatwebdevtools', 'wechatdevtools', 'wx_dev_tools', '微信开发者工具')
+    # 名称含devtools时还需命令行确认
+    CMDLINE_KEYWORDS = ('wechat', '微信开发者工具')
+
+    def __init__(self, attrs=('pid', 'name', 'cmdline')):
+        self.attrs = list(attrs)
+        self._cached_pid = None
+        self._cached_create_time = None
+
+    def _matches(self, proc, name: str) -> bool:
+        if any(keyword in name for keyword in self.NAME_KEYWORDS):
+            return True
+        if 'devtools' in name:
+            cmdline = ' '.join(proc.cmdline() or []).lower()
+            return any(keyword in cmdline for keyword in self.CMDLINE_KEYWORDS)
+        return False
+
+    def _iter_matches(self):
+        import psutil
+
+        for proc in psutil.process_iter(['name']):
+            try:
+                name = (proc.info['name'] or '').lower()
+                if self._matches(proc, name):
+                    yield proc
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+
+    def _cached_process(self):
+        import psutil
+
+        if self._cached_pid is None or not psutil.pid_exists(self._cached_pid):
+            return None
+        try:
+            proc = psutil.Process(self._cached_pid)
+            # PID可能已被其他进程复用
+            if proc.create_time() == self._cached_create_time:
+                return proc
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            pass
+        return None
+
+    def alive(self) -> bool:
+        """上次找到的进程是否仍在运行(不扫描进程表)"""
+        return self._cached_process() is not None
+
+    def find(self) -> Optional[Dict]:
+        """查找开发者工具进程，返回attrs对应的信息"""
+        import psutil
+
+        proc = self._cached_process()
+        if proc is None:
+            self.invalidate()
+            for candidate in self._iter_matches():
+                try:
+                    self._cached_create_time = candidate.create_time()
+                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                    continue
+                self._cached_pid = candidate.pid
+                proc = candidate
+                break
+        if proc is None:
+            return None
+
+        try:
+            return proc.as_dict(attrs=self.attrs)
+        except psutil.NoSuchProcess:
+            self.invalidate()
+            return None
+
+    def find_all(self) -> List[Dict]:
+        """查找所有相关进程(不使用缓存)"""
+        import psutil
+
+        processes = []
+        for proc in self._iter_matches():
+            try:
+                processes.append(proc.as_dict(attrs=self.attrs))
+            except psutil.NoSuchProcess:
+                continue
+        return processes
+
+    def invalidate(self):
+        """清除缓存的PID"""
+        self._cached_pid = None
+        self._cached_create_time = None
+
+
+def status_ttl(default: float = 5.0) -> float:
+    """状态缓存有效期(秒)，可通过环境变量 PWORD_STATUS_TTL 覆盖"""
+    try:
+        return float(os.environ.get('PWORD_STATUS_TTL', default))
+    except ValueError:
+        return default
+
+
+class StatusCache:
+    """状态快照缓存
+
+    快照在超过ttl、validate返回False或调用invalidate()后失效；
+    并发的请求共用同一次重新计算
+    """
+
+    def __init__(self, compute: Callable[[], Awaitable[Any]], ttl: Optional[float] = None,
+                 validate: Optional[Callable[[Any], bool]] = None):
+        self.compute = compute
+        self.ttl = status_ttl() if ttl is None else ttl
+        self.validate = validate
+        self._value = None
+        self._expires = 0.0
+        # 每次失效加一，计算期间失效的结果不写入缓存
+        self._generation = 0
+        self._pending = None
+
+    def invalidate(self, *_):
+        """使快照失效(可直接作为事件回调)"""
+        self._generation += 1
+        self._expires = 0.0
+        self._value = None
+
+    def _fresh(self) -> bool:
+        if time.monotonic() >= self._expires:
+            return False
+        return self.validate is None or self.validate(self._value)
+
+    async def get(self) -> Any:
+        if self._fresh():
+            return self._value
+        if self._pending is None:
+            self._pending = asyncio.ensure_future(self._refresh())
+        try:
+            return await asyncio.shield(self._pending)
+        finally:
+            if self._pending is not None and self._pending.done():
+                self._pending = None
+
+    async def _refresh(self) -> Any:
+        generation = self._generation
+        value = await self.compute()
+        if generation == self._generation:
+            self._value = value
+            self._expires = time.monotonic() + self.ttl
+        return value
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+调试工具常驻进程
+只使用Python内置库；常驻进程保留扫描清单、进程/端口探测结果和到调试端口的连接，
+通过Unix域套接字回答命令行的查询，命令行发现常驻进程未运行时自行计算
+"""
+
+import hashlib
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+from typing import Any, Callable, Dict, Optional
+
+# 套接字所在目录(路径长度受限，不放在项目目录下)
+DAEMON_DIR = os.path.expanduser(os.path.join('~', '.pword-cache'))
+# 等待常驻进程应答的默认超时(秒)，首次扫描大项目可能较慢
+REQUEST_TIMEOUT = 60.0
+
+
+def socket_path(tool: str, project_path: str) -> str:
+    """每个工具、每个项目一个套接字"""
+    digest = hashlib.sha1(os.path.abspath(project_path).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(DAEMON_DIR, f'{tool}-{digest}.sock')
+
+
+def request(path: str, command: str, timeout: float = REQUEST_TIMEOUT) -> Optional[Any]:
+    """向常驻进程发送命令，返回结果；常驻进程未运行或出错时返回None"""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            sock.sendall(json.dumps({'command': command}).encode('utf-8') + b'\n')
+            with sock.makefile('rb') as reader:
+                line = reader.readline()
+    except (OSError, ValueError):
+        return None
+    try:
+        response = json.loads(line)
+    except ValueError:
+        return None
+    if 'error' in response:
+        return None
+    return response.get('result')
+
+
+def call(path: str, command: str, fallback: Callable[[], Any]) -> Any:
+    """优先由常驻进程回答，未运行时在本进程中计算"""
+    result = request(path, command)
+    return fallback() if result is None else result
+
+
+def is_running(path: str) -> bool:
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(1.0)
+            sock.connect(path)
+        return True
+    except OSError:
+        return False
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """每个连接一行JSON请求、一行JSON应答"""
+
+    def handle(self):
+        try:
+            command = json.loads(self.rfile.readline()).get('command')
+        except (ValueError, AttributeError):
+            return
+        handler = self.server.handlers.get(command)
+        if handler is None:
+            response = {'error': f'未知命令: {command}'}
+        else:
+            try:
+                response = {'result': handler()}
+            except Exception as e:
+                response = {'error': str(e)}
+        self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+
+
+def serve(path: str, handlers: Dict[str, Callable[[], Any]]):
+    """在path上监听并逐个处理请求(工具状态不是线程安全的)，直到被中断"""
+    if is_running(path):
+        raise RuntimeError(f"常驻进程已在运行: {path}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 上次异常退出留下的套接字文件
+    if os.path.exists(path):
+        os.unlink(path)
+
+    server = socketserver.UnixStreamServer(path, _Handler)
+    server.handlers = handlers
+    if threading.current_thread() is threading.main_thread():
+        # kill时也删除套接字文件
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        os.chmod(path, 0o600)
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
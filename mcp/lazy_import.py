@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+延迟导入
+只使用Python内置库；启动时只确认模块已安装，首次访问其属性时才真正执行导入，
+缩短MCP服务器的启动时间
+"""
+
+import importlib
+import importlib.util
+import sys
+import threading
+import types
+
+# 多个线程同时首次访问时只导入一次(Python 3.12之前的LazyLoader不是线程安全的)
+_lock = threading.RLock()
+
+
+class _LazyModule(types.ModuleType):
+    """占位模块：首次访问属性时导入真正的模块，之后转发属性访问"""
+
+    def __getattr__(self, attr):
+        return getattr(_load(self.__name__), attr)
+
+
+def _load(name: str):
+    with _lock:
+        module = sys.modules.get(name)
+        if module is None or isinstance(module, _LazyModule):
+            sys.modules.pop(name, None)
+            module = importlib.import_module(name)
+        return module
+
+
+def lazy_import(name: str):
+    """返回延迟加载的模块；模块未安装时立即抛出ModuleNotFoundError"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    module = _LazyModule(name)
+    sys.modules[name] = module
+    return module
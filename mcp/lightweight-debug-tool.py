@@ -4,36 +4,38 @@ P-Word微信小程序轻量级调试工具
 只使用Python内置库，无需外部依赖
 """
 
+import http.client
 import json
 import os
 import sys
 import subprocess
-import socket
-from urllib.request import urlopen
-from urllib.error import URLError
 import time
+import diagnostics_daemon
+from devtools_probe import (candidate_ports, discover_debug_port, open_ports, scan_proc_processes,
+                            split_command_line)
+from project_scanner import DEFAULT_JOBS, ProjectScanner, code_statistics, missing_files
 
 class SimpleDebugTool:
     """轻量级调试工具"""
     
-    def __init__(self, project_path=None):
+    def __init__(self, project_path=None, jobs=DEFAULT_JOBS):
         self.project_path = project_path or os.getcwd()
+        self.jobs = jobs
+        # 常驻进程中反复使用的扫描器和到调试端口的连接
+        self._scanner = None
+        self._connection = None
         
-    def check_port_open(self, port):
-        """检查端口是否开启"""
-        try:
-            # 使用127.0.0.1而不是localhost避免DNS解析问题
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(1)
-            result = sock.connect_ex(('127.0.0.1', port))
-            sock.close()
-            return result == 0
-        except Exception:
-            return False
-    
     def check_devtools_process(self):
-        """检查微信开发者工具进程"""
+        """检查微信开发者工具进程，返回(是否运行, 进程信息, 命令行参数列表)"""
         try:
+            # Linux下直接读/proc，避免fork ps
+            processes = scan_proc_processes()
+            if processes is not None:
+                if processes:
+                    cmdline = processes[0]['cmdline']
+                    return True, f"{processes[0]['pid']} {' '.join(cmdline)}", cmdline
+                return False, "", None
+            
             result = subprocess.run(['ps', 'aux'], capture_output=True, text=True)
             output = result.stdout.lower()
             
@@ -41,35 +43,61 @@ class SimpleDebugTool:
                 lines = result.stdout.split('\n')
                 for line in lines:
                     if 'wechatwebdevtools' in line.lower() or 'wechatdevtools' in line.lower():
-                        return True, line.strip()
-            return False, ""
+                        # ps aux的第11列起是命令行
+                        fields = line.split(None, 10)
+                        cmdline = split_command_line(fields[10]) if len(fields) > 10 else None
+                        return True, line.strip(), cmdline
+            return False, "", None
         except Exception as e:
-            return False, f"检查进程失败: {e}"
+            return False, f"检查进程失败: {e}", None
+    
+    def find_debug_port(self, cmdline=None):
+        """查找调试端口：优先从进程命令行或DevToolsActivePort读取，找不到再探测"""
+        port = discover_debug_port(cmdline)
+        if port:
+            return port
+        active_ports = open_ports(candidate_ports())
+        return active_ports[0] if active_ports else None
+    
+    def get_json(self, port, path):
+        """GET调试端口上的JSON接口，复用keep-alive连接，断开时重连一次"""
+        for attempt in range(2):
+            if self._connection is None or self._connection.port != port:
+                if self._connection is not None:
+                    self._connection.close()
+                self._connection = http.client.HTTPConnection('127.0.0.1', port, timeout=3)
+            try:
+                self._connection.request('GET', path)
+                response = self._connection.getresponse()
+                return json.loads(response.read().decode('utf-8'))
+            except (http.client.HTTPException, OSError):
+                self._connection.close()
+                self._connection = None
+                if attempt:
+                    raise
     
     def get_debug_targets(self, port):
         """获取调试目标"""
         try:
-            with urlopen(f'http://127.0.0.1:{port}/json', timeout=3) as response:
-                data = response.read().decode('utf-8')
-                targets = json.loads(data)
-                
-                # 过滤相关目标
-                p_word_targets = []
-                for target in targets:
-                    title = target.get('title', '')
-                    url = target.get('url', '')
-                    # 更宽松的匹配条件
-                    if (target.get('type') == 'page' or
-                        'p-word' in title.lower() or 
-                        'miniprogram' in url.lower() or
-                        '微信开发者工具' in title or
-                        'devtools' in title.lower() or
-                        'YOUR_DEBUG_APPID_HERE' in url):  # P-Word的appid
-                        p_word_targets.append(target)
-                        
-                return p_word_targets
+            targets = self.get_json(port, '/json')
         except Exception as e:
             return []
+        
+        # 过滤相关目标
+        p_word_targets = []
+        for target in targets:
+            title = target.get('title', '')
+            url = target.get('url', '')
+            # 更宽松的匹配条件
+            if (target.get('type') == 'page' or
+                'p-word' in title.lower() or 
+                'miniprogram' in url.lower() or
+                '微信开发者工具' in title or
+                'devtools' in title.lower() or
+                'YOUR_DEBUG_APPID_HERE' in url):  # P-Word的appid
+                p_word_targets.append(target)
+                
+        return p_word_targets
     
     def analyze_project_files(self):
         """分析项目文件"""
@@ -91,38 +119,18 @@ class SimpleDebugTool:
             'miniprogram/app.wxss'
         ]
         
-        for file_path in required_files:
-            full_path = os.path.join(self.project_path, file_path)
-            if not os.path.exists(full_path):
-                stats['missing_files'].append(file_path)
+        # 一次遍历完成所有检查(只重新读取有变化的文件)
+        if self._scanner is None:
+            self._scanner = ProjectScanner(self.project_path, jobs=self.jobs)
+        files = self._scanner.scan()
+        stats['missing_files'] = missing_files(files, required_files)
         
         # 统计代码文件
-        miniprogram_dir = os.path.join(self.project_path, 'miniprogram')
-        if os.path.exists(miniprogram_dir):
-            for root, dirs, files in os.walk(miniprogram_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    
-                    if file.endswith('.js'):
-                        stats['js_files'] += 1
-                        try:
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                stats['total_lines'] += len(f.readlines())
-                        except Exception:
-                            pass
-                    elif file.endswith('.wxml'):
-                        stats['wxml_files'] += 1
-                    elif file.endswith('.wxss'):
-                        stats['wxss_files'] += 1
-                    elif file.endswith('.json'):
-                        stats['json_files'] += 1
-                        # 验证JSON格式
-                        try:
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                json.load(f)
-                        except json.JSONDecodeError as e:
-                            rel_path = os.path.relpath(file_path, self.project_path)
-                            stats['json_errors'].append(f"{rel_path}: {str(e)[:50]}...")
+        code_stats = code_statistics(files)
+        for key in ('js_files', 'wxml_files', 'wxss_files', 'json_files', 'total_lines'):
+            stats[key] = code_stats[key]
+        for rel_path, error in code_stats['json_errors']:
+            stats['json_errors'].append(f"{rel_path}: {error[:50]}...")
         
         return stats
     
@@ -131,7 +139,7 @@ class SimpleDebugTool:
         report = ["🔍 P-Word项目状态报告", "=" * 40]
         
         # 1. 检查微信开发者工具
-        process_running, process_info = self.check_devtools_process()
+        process_running, process_info, cmdline = self.check_devtools_process()
         if process_running:
             report.extend([
                 "✅ 微信开发者工具: 运行中",
@@ -144,13 +152,7 @@ class SimpleDebugTool:
             ])
         
         # 2. 检查调试端口
-        debug_ports = [9222, 9223, 9224, 9225]
-        active_port = None
-        
-        for port in debug_ports:
-            if self.check_port_open(port):
-                active_port = port
-                break
+        active_port = self.find_debug_port(cmdline)
         
         if active_port:
             report.append(f"✅ 调试端口: {active_port} (已开启)")
@@ -199,6 +201,28 @@ class SimpleDebugTool:
         
         return "\n".join(report)
     
+    def generate_json_report(self):
+        """生成JSON格式的状态，供其他工具使用"""
+        stats = self.analyze_project_files()
+        process_running, _, cmdline = self.check_devtools_process()
+        
+        result = {
+            'process_running': process_running,
+            'debug_port': self.find_debug_port(cmdline),
+            'project_stats': stats,
+            'timestamp': time.time()
+        }
+        return json.dumps(result, ensure_ascii=False, indent=2)
+    
+    def serve(self):
+        """以常驻进程运行，通过Unix域套接字回答status/json"""
+        path = diagnostics_daemon.socket_path('lightweight', self.project_path)
+        print(f"🔌 常驻进程已启动: {path} (Ctrl+C退出)")
+        diagnostics_daemon.serve(path, {
+            'status': self.generate_status_report,
+            'json': self.generate_json_report,
+        })
+    
     def get_debug_suggestions(self):
         """获取调试建议"""
         return """
@@ -224,37 +248,81 @@ class SimpleDebugTool:
 
 📋 快速命令:
 • python3 lightweight-debug-tool.py - 运行调试工具
+• python3 lightweight-debug-tool.py daemon & - 常驻运行，加速status/json
 • ./start-devtools-with-debug.sh - 启动调试模式
 • curl http://localhost:9222/json - 查看调试目标
 """
 
+USAGE = ("可用命令: status, suggestions, json, daemon  "
+         "(可选参数: --jobs N 并行扫描线程数(在本进程中扫描), --no-daemon 不使用常驻进程)")
+
+def parse_jobs(value):
+    """线程数必须是正整数，否则抛出ValueError"""
+    try:
+        jobs = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"--jobs 需要正整数，收到: {value}")
+    if jobs < 1:
+        raise ValueError(f"--jobs 需要正整数，收到: {value}")
+    return jobs
+
+def pop_jobs_option(args):
+    """从参数中取出 --jobs N / --jobs=N，返回(线程数, 剩余参数)；未指定时线程数为None，取值无效时抛出ValueError"""
+    jobs = None
+    rest = []
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == '--jobs':
+            if i + 1 >= len(args):
+                raise ValueError("--jobs 缺少线程数")
+            jobs = parse_jobs(args[i + 1])
+            i += 2
+            continue
+        if arg.startswith('--jobs='):
+            jobs = parse_jobs(arg.split('=', 1)[1])
+        else:
+            rest.append(arg)
+        i += 1
+    return jobs, rest
+
 def main():
     """主函数"""
     print("🚀 P-Word轻量级调试工具")
     
-    tool = SimpleDebugTool()
+    try:
+        jobs, args = pop_jobs_option(sys.argv[1:])
+    except ValueError as e:
+        print(f"❌ {e}")
+        print(USAGE)
+        sys.exit(2)
+    # --no-daemon: 不使用常驻进程，总是在本进程中计算；
+    # 显式指定--jobs时常驻进程无法按该线程数扫描，也在本进程中计算
+    use_daemon = '--no-daemon' not in args and jobs is None
+    args = [arg for arg in args if arg != '--no-daemon']
+    tool = SimpleDebugTool(jobs=DEFAULT_JOBS if jobs is None else jobs)
+    daemon_path = diagnostics_daemon.socket_path('lightweight', tool.project_path)
     
-    if len(sys.argv) > 1:
-        command = sys.argv[1]
+    def report(command, local):
+        # 常驻进程在运行时由它回答
+        if use_daemon:
+            return diagnostics_daemon.call(daemon_path, command, local)
+        return local()
+    
+    if args:
+        command = args[0]
         
         if command == 'status':
-            print(tool.generate_status_report())
-        elif command == 'suggestions':
-            print(tool.get_debug_suggestions())
+            print(report('status', tool.generate_status_report))
         elif command == 'json':
             # 输出JSON格式，供其他工具使用
-            stats = tool.analyze_project_files()
-            process_running, _ = tool.check_devtools_process()
-            
-            result = {
-                'process_running': process_running,
-                'debug_port': 9222 if tool.check_port_open(9222) else None,
-                'project_stats': stats,
-                'timestamp': time.time()
-            }
-            print(json.dumps(result, ensure_ascii=False, indent=2))
+            print(report('json', tool.generate_json_report))
+        elif command == 'suggestions':
+            print(tool.get_debug_suggestions())
+        elif command == 'daemon':
+            tool.serve()
         else:
-            print("可用命令: status, suggestions, json")
+            print(USAGE)
     else:
         # 交互模式
         while True:
@@ -268,7 +336,7 @@ def main():
                 choice = input("\n请选择 (1-3): ").strip()
                 
                 if choice == '1':
-                    print("\n" + tool.generate_status_report())
+                    print("\n" + report('status', tool.generate_status_report))
                 elif choice == '2':
                     print(tool.get_debug_suggestions())
                 elif choice == '3':
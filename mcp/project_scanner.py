@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+P-Word项目增量扫描器
+只使用Python内置库，按 大小/修改时间/内容哈希 缓存每个文件的分析结果，
+未变化的文件不再重复读取
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+MANIFEST_VERSION = 2
+# 默认清单位置(相对项目根目录)
+MANIFEST_PATH = os.path.join('.pword-cache', 'scan-manifest.json')
+
+CONSOLE_PATTERN = re.compile(rb'console\.(log|warn|error|info|debug)\b')
+# 超过该大小的文件使用mmap读取
+MMAP_THRESHOLD = 64 * 1024
+# 对mmap分块计数时每块的大小
+_CHUNK_SIZE = 1024 * 1024
+
+
+def count_newlines(data, start: int = 0, end: Optional[int] = None) -> int:
+    """统计data[start:end]中的换行数，mmap按块切片以限制内存"""
+    if end is None:
+        end = len(data)
+    if isinstance(data, bytes):
+        return data.count(b'\n', start, end)
+    count = 0
+    for offset in range(start, end, _CHUNK_SIZE):
+        count += data[offset:min(offset + _CHUNK_SIZE, end)].count(b'\n')
+    return count
+
+
+def count_lines(data) -> int:
+    """与 len(f.readlines()) 结果一致的行数"""
+    if not len(data):
+        return 0
+    return count_newlines(data) + (0 if data[-1:] == b'\n' else 1)
+
+
+class ScanCheck:
+    """单文件检查：由扫描器把文件内容(bytes或mmap)分发给每个适用的检查"""
+
+    # 结果在清单中的键名
+    name = ''
+    # 适用的文件扩展名
+    extensions = ()
+
+    def applies(self, rel_path: str) -> bool:
+        return rel_path.endswith(self.extensions)
+
+    def visit(self, rel_path: str, data: bytes):
+        """返回可JSON序列化的结果"""
+        raise NotImplementedError
+
+
+class LineCountCheck(ScanCheck):
+    """代码行数"""
+
+    name = 'lines'
+    extensions = ('.js',)
+
+    def visit(self, rel_path, data):
+        return count_lines(data)
+
+
+class ConsoleCallCheck(ScanCheck):
+    """console调用位置"""
+
+    name = 'console_calls'
+    extensions = ('.js',)
+
+    def visit(self, rel_path, data):
+        calls = []
+        line_no = 1
+        position = 0
+        # 当前行已记录的方法，同一行的不同方法分别记录
+        seen = set()
+        for match in CONSOLE_PATTERN.finditer(data):
+            start = match.start()
+            newlines = count_newlines(data, position, start)
+            if newlines:
+                line_no += newlines
+                seen.clear()
+            position = start
+            method = match.group(1).decode('ascii')
+            if method in seen:
+                continue
+            seen.add(method)
+            line_start = data.rfind(b'\n', 0, start) + 1
+            line_end = data.find(b'\n', start)
+            if line_end == -1:
+                line_end = len(data)
+            # 只解码命中的行
+            content = data[line_start:line_end].decode('utf-8', errors='replace').strip()
+            calls.append([line_no, method, content])
+        return calls
+
+
+class JsonCheck(ScanCheck):
+    """JSON格式校验，结果为错误信息或None"""
+
+    name = 'json_error'
+    extensions = ('.json',)
+
+    def visit(self, rel_path, data):
+        try:
+            json.loads(bytes(data).decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            return str(e)
+        return None
+
+
+DEFAULT_CHECKS = (LineCountCheck(), ConsoleCallCheck(), JsonCheck())
+# miniprogram/之外也需要检查的文件
+ROOT_FILES = ('project.config.json',)
+# 默认并行读取文件的线程数
+DEFAULT_JOBS = min(8, os.cpu_count() or 1)
+
+
+class ProjectScanner:
+    """增量扫描 miniprogram/ 目录
+
+    一次遍历，每个文件最多打开一次，内容分发给所有注册的检查；
+    需要重新读取的文件交给线程池并行处理，结果按遍历顺序合并
+    """
+
+    def __init__(self, project_path: str, root: str = 'miniprogram',
+                 manifest_path: Optional[str] = MANIFEST_PATH,
+                 checks=DEFAULT_CHECKS, root_files=ROOT_FILES, jobs: int = DEFAULT_JOBS):
+        self.project_path = project_path
+        self.root = root
+        self.checks = list(checks)
+        self.root_files = list(root_files)
+        self.jobs = max(1, jobs)
+        # manifest_path为None时不做持久化
+        self.manifest_path = os.path.join(project_path, manifest_path) if manifest_path else None
+        self.read_count = 0
+        self.cached_count = 0
+        # 上次扫描的结果；同一个扫描器重复扫描时不再从磁盘读取清单
+        self._files = None
+
+    def load_manifest(self) -> Dict[str, Dict]:
+        if not self.manifest_path:
+            return {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get('version') != MANIFEST_VERSION:
+            return {}
+        return manifest.get('files', {})
+
+    def save_manifest(self, files: Dict[str, Dict]):
+        if not self.manifest_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+            tmp_path = self.manifest_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': MANIFEST_VERSION, 'files': files}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError:
+            # 项目目录只读时放弃缓存
+            pass
+
+    def _walk(self, path: str):
+        """按名称顺序递归列出文件(DirEntry自带stat缓存)"""
+        try:
+            entries = sorted(os.scandir(path), key=lambda e: e.name)
+        except OSError:
+            return
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from self._walk(entry.path)
+            elif entry.is_file():
+                yield entry
+
+    def _entries(self):
+        """项目根目录下的指定文件 + root目录下的全部文件"""
+        if self.root_files:
+            try:
+                with os.scandir(self.project_path) as it:
+                    root_entries = {e.name: e for e in it if e.name in self.root_files}
+            except OSError:
+                root_entries = {}
+            for name in self.root_files:
+                entry = root_entries.get(name)
+                if entry is not None and entry.is_file():
+                    yield entry
+        yield from self._walk(os.path.join(self.project_path, self.root))
+
+    def _analyze(self, rel_path: str, data: bytes) -> Dict:
+        info = {}
+        for check in self.checks:
+            if check.applies(rel_path):
+                info[check.name] = check.visit(rel_path, data)
+        return info
+
+    def _is_complete(self, rel_path: str, info: Dict) -> bool:
+        """缓存结果是否覆盖了所有适用的检查"""
+        return all(check.name in info for check in self.checks if check.applies(rel_path))
+
+    def _applies(self, rel_path: str) -> bool:
+        """是否有检查适用于该文件；没有时只需记录大小和修改时间"""
+        return any(check.applies(rel_path) for check in self.checks)
+
+    def _process(self, item) -> Optional[Dict]:
+        """读取并分析单个文件(可在工作线程中执行)"""
+        rel_path, path, stat, cached = item
+        try:
+            with open(path, 'rb') as f:
+                if stat.st_size >= MMAP_THRESHOLD:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                else:
+                    data = f.read()
+        except (OSError, ValueError):
+            return None
+
+        try:
+            digest = hashlib.sha1(data).hexdigest()
+            if cached and cached.get('hash') == digest:
+                # 只是修改时间变化，内容未变
+                info = dict(cached)
+            else:
+                info = self._analyze(rel_path, data)
+                info['hash'] = digest
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+        info['size'] = stat.st_size
+        info['mtime_ns'] = stat.st_mtime_ns
+        return info
+
+    def scan(self) -> Dict[str, Dict]:
+        """扫描项目，返回 {相对路径: 文件信息}"""
+        previous = self._files if self._files is not None else self.load_manifest()
+        files = {}
+        pending = []
+        # 只更新了大小和修改时间的文件数
+        stat_only = 0
+        self.read_count = 0
+        self.cached_count = 0
+
+        for entry in self._entries():
+            rel_path = os.path.relpath(entry.path, self.project_path).replace(os.sep, '/')
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+
+            cached = previous.get(rel_path)
+            if cached and not self._is_complete(rel_path, cached):
+                cached = None
+            if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+                files[rel_path] = cached
+                self.cached_count += 1
+                continue
+            if not self._applies(rel_path):
+                # 图片、样式等资源文件不打开读取，也不计算哈希
+                files[rel_path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+                stat_only += 1
+                continue
+
+            # 先占位，保证结果顺序与遍历顺序一致
+            files[rel_path] = None
+            pending.append((rel_path, entry.path, stat, cached))
+
+        if self.jobs > 1 and len(pending) > 1:
+            with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                results = list(executor.map(self._process, pending))
+        else:
+            results = [self._process(item) for item in pending]
+
+        for (rel_path, _, _, _), info in zip(pending, results):
+            if info is None:
+                del files[rel_path]
+            else:
+                files[rel_path] = info
+                self.read_count += 1
+
+        if self.read_count or stat_only or len(files) != len(previous):
+            self.save_manifest(files)
+        self._files = files
+        return files
+
+
+def missing_files(files: Dict[str, Dict], required: List[str]) -> List[str]:
+    """根据扫描结果找出缺失的必需文件(无需额外stat)"""
+    return [path for path in required if path not in files]
+
+
+def code_statistics(files: Dict[str, Dict], root: str = 'miniprogram') -> Dict:
+    """根据扫描结果汇总root目录下的代码统计"""
+    stats = {
+        'js_files': 0,
+        'wxml_files': 0,
+        'wxss_files': 0,
+        'json_files': 0,
+        'total_lines': 0,
+        'json_errors': []
+    }
+    prefix = root + '/'
+    for rel_path, info in files.items():
+        if not rel_path.startswith(prefix):
+            continue
+        if rel_path.endswith('.js'):
+            stats['js_files'] += 1
+            stats['total_lines'] += info.get('lines', 0)
+        elif rel_path.endswith('.wxml'):
+            stats['wxml_files'] += 1
+        elif rel_path.endswith('.wxss'):
+            stats['wxss_files'] += 1
+        elif rel_path.endswith('.json'):
+            stats['json_files'] += 1
+            if info.get('json_error'):
+                stats['json_errors'].append((rel_path, info['json_error']))
+    return stats
+
+
+def console_calls(files: Dict[str, Dict], methods=('log', 'warn', 'error')) -> List[Dict]:
+    """列出指定方法的console调用位置"""
+    calls = []
+    for rel_path, info in files.items():
+        for line, method, content in info.get('console_calls', []):
+            if method in methods:
+                calls.append({'file': rel_path, 'line': line, 'method': method, 'content': content})
+    return calls
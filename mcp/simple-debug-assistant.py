@@ -11,6 +11,9 @@ import time
 import subprocess
 import asyncio
 from typing import Dict, List, Optional, Any
+import diagnostics_daemon
+from devtools_probe import DevToolsProcessFinder, candidate_ports, discover_debug_port
+from project_scanner import ProjectScanner, code_statistics
 
 try:
     import requests
@@ -27,40 +30,37 @@ class WeChatDevToolsDebugger:
     def __init__(self, project_path: str = None):
         self.project_path = project_path or os.getcwd()
         self.debug_port = None
+        self.process_finder = DevToolsProcessFinder(attrs=('pid', 'name', 'status', 'cmdline'))
+        # keep-alive连接和增量扫描器，常驻进程中跨请求复用
+        self.http = requests.Session()
+        self._scanner = None
         
     def find_devtools_process(self) -> Optional[Dict]:
         """查找微信开发者工具进程"""
         try:
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline', 'status']):
-                try:
-                    name = proc.info['name'].lower()
-                    cmdline = ' '.join(proc.info['cmdline'] or []).lower()
-                    
-                    if ('wechatwebdevtools' in name or 
-                        'wechatdevtools' in name or
-                        ('devtools' in name and 'wechat' in cmdline)):
-                        return {
-                            'pid': proc.info['pid'],
-                            'name': proc.info['name'],
-                            'status': proc.info['status'],
-                            'cmdline': proc.info['cmdline']
-                        }
-                        
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
+            return self.process_finder.find()
         except Exception as e:
             print(f"查找进程失败: {e}")
         return None
     
     def get_debug_port(self) -> Optional[int]:
         """获取调试端口"""
-        if self.debug_port:
+        # 开发者工具重启后端口可能变化
+        if self.debug_port and self.process_finder.alive():
             return self.debug_port
-            
-        ports = [9222, 9223, 9224, 9225]
-        for port in ports:
+        self.debug_port = None
+        
+        # 优先从进程命令行或DevToolsActivePort读取
+        process = self.find_devtools_process()
+        port = discover_debug_port(process['cmdline'] if process else None)
+        if port:
+            self.debug_port = port
+            return port
+        
+        # 回退到端口探测
+        for port in candidate_ports():
             try:
-                response = requests.get(f'http://localhost:{port}/json/version', timeout=2)
+                response = self.http.get(f'http://localhost:{port}/json/version', timeout=2)
                 if response.status_code == 200:
                     self.debug_port = port
                     return port
@@ -75,7 +75,7 @@ class WeChatDevToolsDebugger:
             return []
             
         try:
-            response = requests.get(f'http://localhost:{port}/json', timeout=5)
+            response = self.http.get(f'http://localhost:{port}/json', timeout=5)
             if response.status_code == 200:
                 targets = response.json()
                 # 过滤P-Word相关的目标
@@ -208,31 +208,48 @@ class WeChatDevToolsDebugger:
         }
         
         try:
-            miniprogram_dir = os.path.join(self.project_path, "miniprogram")
-            if os.path.exists(miniprogram_dir):
-                for root, dirs, files in os.walk(miniprogram_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        
-                        if file.endswith('.js'):
-                            stats['js_files'] += 1
-                            try:
-                                with open(file_path, 'r', encoding='utf-8') as f:
-                                    stats['total_lines'] += len(f.readlines())
-                            except Exception:
-                                pass
-                                
-                        elif file.endswith('.wxml'):
-                            stats['wxml_files'] += 1
-                            
-                        elif file.endswith('.wxss'):
-                            stats['wxss_files'] += 1
-                            
+            # 只重新读取有变化的文件
+            if self._scanner is None:
+                self._scanner = ProjectScanner(self.project_path)
+            code_stats = code_statistics(self._scanner.scan())
+            for key in stats:
+                stats[key] = code_stats[key]
         except Exception as e:
             print(f"统计代码时出错: {e}")
             
         return stats
     
+    def status_info(self) -> Dict[str, Any]:
+        """状态摘要(check_devtools_status接口的结果)"""
+        process = self.find_devtools_process()
+        port = self.get_debug_port()
+        targets = self.get_debug_targets()
+        
+        return {
+            'process_running': process is not None,
+            'debug_port': port,
+            'targets_count': len(targets),
+            'status_text': self.check_status()
+        }
+    
+    def project_info(self) -> Dict[str, Any]:
+        """项目摘要(analyze_project_structure接口的结果)"""
+        return {
+            'code_statistics': self.get_code_statistics(),
+            'analysis_text': self.analyze_project()
+        }
+    
+    def serve(self):
+        """以常驻进程运行，通过Unix域套接字回答状态和分析请求"""
+        path = diagnostics_daemon.socket_path('assistant', self.project_path)
+        print(f"🔌 常驻进程已启动: {path} (Ctrl+C退出)")
+        diagnostics_daemon.serve(path, {
+            'status': self.check_status,
+            'analyze': self.analyze_project,
+            'status_info': self.status_info,
+            'project_info': self.project_info,
+        })
+    
     def get_debug_guide(self) -> str:
         """获取调试指导"""
         return """
@@ -278,6 +295,19 @@ def main():
     project_path = os.path.dirname(os.path.abspath(__file__))
     debugger = WeChatDevToolsDebugger(project_path)
     
+    if sys.argv[1:] == ['daemon']:
+        debugger.serve()
+        return
+    
+    # 常驻进程在运行时由它回答
+    daemon_path = diagnostics_daemon.socket_path('assistant', project_path)
+    
+    def check_status() -> str:
+        return diagnostics_daemon.call(daemon_path, 'status', debugger.check_status)
+    
+    def analyze_project() -> str:
+        return diagnostics_daemon.call(daemon_path, 'analyze', debugger.analyze_project)
+    
     while True:
         print("\n" + "="*50)
         print("📋 可用功能:")
@@ -291,18 +321,18 @@ def main():
             choice = input("\n请选择功能 (1-5): ").strip()
             
             if choice == '1':
-                print("\n" + debugger.check_status())
+                print("\n" + check_status())
                 
             elif choice == '2':
-                print("\n" + debugger.analyze_project())
+                print("\n" + analyze_project())
                 
             elif choice == '3':
                 print(debugger.get_debug_guide())
                 
             elif choice == '4':
                 print("\n🔍 正在进行一键诊断...")
-                print("\n" + debugger.check_status())
-                print("\n" + debugger.analyze_project())
+                print("\n" + check_status())
+                print("\n" + analyze_project())
                 
             elif choice == '5':
                 print("👋 再见！")
@@ -319,29 +349,16 @@ def main():
 
 # API接口 - 供其他程序调用
 def check_devtools_status(project_path: str = None) -> Dict[str, Any]:
-    """检查开发者工具状态 - API接口"""
-    debugger = WeChatDevToolsDebugger(project_path)
-    
-    process = debugger.find_devtools_process()
-    port = debugger.get_debug_port()
-    targets = debugger.get_debug_targets()
-    
-    return {
-        'process_running': process is not None,
-        'debug_port': port,
-        'targets_count': len(targets),
-        'status_text': debugger.check_status()
-    }
+    """检查开发者工具状态 - API接口(常驻进程在运行时由它回答)"""
+    project_path = project_path or os.getcwd()
+    return diagnostics_daemon.call(diagnostics_daemon.socket_path('assistant', project_path), 'status_info',
+                                   lambda: WeChatDevToolsDebugger(project_path).status_info())
 
 def analyze_project_structure(project_path: str = None) -> Dict[str, Any]:
-    """分析项目结构 - API接口"""
-    debugger = WeChatDevToolsDebugger(project_path)
-    stats = debugger.get_code_statistics()
-    
-    return {
-        'code_statistics': stats,
-        'analysis_text': debugger.analyze_project()
-    }
+    """分析项目结构 - API接口(常驻进程在运行时由它回答)"""
+    project_path = project_path or os.getcwd()
+    return diagnostics_daemon.call(diagnostics_daemon.socket_path('assistant', project_path), 'project_info',
+                                   lambda: WeChatDevToolsDebugger(project_path).project_info())
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -8,7 +8,10 @@ import asyncio
 import json
 import logging
 import os
+import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 # 配置日志
@@ -17,134 +20,98 @@ logger = logging.getLogger(__name__)
 
 try:
     from mcp.server.fastmcp import FastMCP
-    import psutil
-    import aiohttp
-    import websockets
+    from lazy_import import lazy_import
+    # 较重的依赖启动时只检查是否安装，首次使用时才加载
+    lazy_import('psutil')
+    from cdp_session import DevToolsConnection
+    from project_scanner import ProjectScanner, console_calls, missing_files
+    from devtools_logs import (LogIndex, collapse_records, format_group, format_record,
+                               parse_time_spec, record_filter)
 except ImportError as e:
     logger.error(f"缺少依赖包: {e}")
     sys.exit(1)
 
-# 创建MCP服务器
-mcp = FastMCP("WeChat DevTools Debug Server")
-
-class WeChatDevToolsConnector:
+class WeChatDevToolsConnector(DevToolsConnection):
     """微信开发者工具连接器 - 增强版"""
     
     def __init__(self):
+        super().__init__()
         self.project_path = "/Users/gongshenshen/KnowledgeBase/20_学习中/P-Word"
-        self.debug_port = None
-        self.last_logs = []
-        
-    async def find_devtools_process(self) -> Optional[Dict]:
-        """查找微信开发者工具进程"""
-        try:
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-                try:
-                    name = proc.info['name'].lower()
-                    cmdline = ' '.join(proc.info['cmdline'] or []).lower()
-                    
-                    if ('wechatwebdevtools' in name or 
-                        'wechatdevtools' in name or
-                        ('devtools' in name and 'wechat' in cmdline)):
-                        return proc.info
-                        
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
-        except Exception as e:
-            logger.error(f"查找进程失败: {e}")
-        return None
+        # 日志历史索引(首次查询时打开)；SQLite连接只能在创建它的线程中使用，
+        # 所以索引的所有操作都放到同一个专用线程里执行
+        self._log_index = None
+        self._index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='log-index')
     
-    async def get_debug_port(self) -> Optional[int]:
-        """获取调试端口"""
-        if self.debug_port:
-            return self.debug_port
-            
-        ports = [9222, 9223, 9224, 9225]
-        for port in ports:
-            try:
-                async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=2)) as session:
-                    async with session.get(f'http://localhost:{port}/json/version') as resp:
-                        if resp.status == 200:
-                            self.debug_port = port
-                            return port
-            except Exception:
-                continue
-        return None
+    def log_index(self) -> LogIndex:
+        """获取日志历史索引(只能在索引线程中调用)"""
+        if self._log_index is None:
+            self._log_index = LogIndex()
+        return self._log_index
     
-    async def get_debug_targets(self) -> List[Dict]:
-        """获取调试目标"""
-        port = await self.get_debug_port()
-        if not port:
-            return []
-            
-        try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
-                async with session.get(f'http://localhost:{port}/json') as resp:
-                    if resp.status == 200:
-                        targets = await resp.json()
-                        # 过滤P-Word相关的目标
-                        return [t for t in targets if 'p-word' in t.get('title', '').lower() or 
-                               'miniprogram' in t.get('url', '').lower()]
-        except Exception as e:
-            logger.error(f"获取调试目标失败: {e}")
-        return []
+    async def run_in_index_thread(self, func, *args):
+        """在索引专用线程中执行func(index, *args)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._index_executor, lambda: func(self.log_index(), *args))
+    
+    def _close_log_index(self):
+        if self._log_index is not None:
+            self._log_index.close()
+            self._log_index = None
+    
+    async def close(self):
+        """关闭共享HTTP会话和日志索引"""
+        await super().close()
+        await asyncio.get_running_loop().run_in_executor(self._index_executor, self._close_log_index)
     
     async def read_console_logs(self, limit: int = 10) -> List[Dict]:
-        """读取控制台日志"""
-        targets = await self.get_debug_targets()
-        if not targets:
-            return []
-        
-        logs = []
-        for target in targets[:1]:  # 只读取第一个目标
-            try:
-                ws_url = target['webSocketDebuggerUrl']
-                async with websockets.connect(ws_url, timeout=5) as websocket:
-                    # 启用Runtime和Console
-                    await websocket.send(json.dumps({"id": 1, "method": "Runtime.enable"}))
-                    await websocket.send(json.dumps({"id": 2, "method": "Console.enable"}))
-                    
-                    # 监听消息
-                    timeout_count = 0
-                    while timeout_count < 3:
-                        try:
-                            message = await asyncio.wait_for(websocket.recv(), timeout=1.0)
-                            data = json.loads(message)
-                            
-                            if data.get('method') in ['Console.messageAdded', 'Runtime.consoleAPICalled']:
-                                logs.append({
-                                    'timestamp': data.get('params', {}).get('timestamp', ''),
-                                    'level': data.get('params', {}).get('level', 'log'),
-                                    'text': str(data.get('params', {}))
-                                })
-                        except asyncio.TimeoutError:
-                            timeout_count += 1
-                            
-            except Exception as e:
-                logger.error(f"读取日志失败: {e}")
-                
-        self.last_logs = logs[-limit:] if logs else []
-        return self.last_logs
+        """读取控制台日志(直接取自后台采集的缓冲区)"""
+        self.console_session.start()
+        return self.console_session.buffer.latest(limit)
+    
+    async def read_console_logs_since(self, cursor: int, limit: int = 100, predicate=None):
+        """读取序号大于cursor(且满足predicate)的控制台日志，返回(记录, 下一个游标, 漏掉的条数)"""
+        self.console_session.start()
+        return self.console_session.buffer.since(cursor, limit, predicate)
 
 # 实例化连接器
 connector = WeChatDevToolsConnector()
 
+def record_to_dict(seq: int, record, raw: bool = False) -> Dict:
+    """缓冲区记录转为返回给客户端的字典，raw为True时附带原始CDP事件(未保留时为null)"""
+    result = {
+        "seq": seq,
+        "time": record.time,
+        "level": record.level,
+        "module": record.module,
+        "source": record.source,
+        "message": record.message,
+    }
+    if raw:
+        result["raw"] = record.raw_event() if hasattr(record, 'raw_event') else None
+    return result
+
+# 创建MCP服务器
+mcp = FastMCP("WeChat DevTools Debug Server", lifespan=connector.lifespan)
+
 @mcp.tool()
 async def check_devtools_status() -> str:
     """检查微信开发者工具状态"""
     try:
+        # 状态快照有效时直接取缓存
+        snapshot = await connector.status_cache.get()
+        
         # 检查进程
-        process = await connector.find_devtools_process()
+        process = snapshot['process']
         if not process:
             return "❌ 微信开发者工具未运行\n💡 请启动微信开发者工具并打开P-Word项目"
         
         # 检查调试端口
-        port = await connector.get_debug_port()
+        port = snapshot['port']
         if not port:
             return f"⚠️ 进程运行中(PID: {process['pid']})，但调试端口未开启\n💡 请在设置中启用Chrome调试器"
         
         # 检查调试目标
-        targets = await connector.get_debug_targets()
+        targets = snapshot['targets']
         
         status = [
             "✅ 微信开发者工具状态正常",
@@ -164,32 +131,148 @@ async def check_devtools_status() -> str:
         return f"❌ 状态检查失败: {str(e)}"
 
 @mcp.tool()
-async def read_debug_logs(count: int = 10) -> str:
-    """读取微信开发者工具的调试日志"""
+async def read_debug_logs(count: int = 10, since: int = -1, max: int = 100, collapse: bool = True) -> str:
+    """读取微信开发者工具的调试日志
+
+    不传since时返回最新count条日志文本，末尾附带当前游标；
+    collapse为true时相同的消息(数字不同也算相同)合并为一条并注明次数和时间范围；
+    传入since(上次返回的游标，首次传0)时只返回之后新增的最多max条记录，
+    结果为JSON: {"cursor": 下一个游标, "dropped": 因缓冲区溢出漏掉的条数, "records": [...]}
+    """
     try:
+        if since >= 0:
+            records, cursor, dropped = await connector.read_console_logs_since(since, max)
+            return json.dumps({
+                "cursor": cursor,
+                "dropped": dropped,
+                "records": [record_to_dict(seq, record) for seq, record in records],
+            }, ensure_ascii=False)
+        
         # 首先检查状态
         port = await connector.get_debug_port()
         if not port:
             return "❌ 调试端口未开启，请先启用Chrome调试器"
         
         # 读取日志
-        logs = await connector.read_console_logs(count)
+        if collapse:
+            connector.console_session.start()
+            logs = collapse_records(connector.console_session.buffer.iter_newest(), limit=count)
+        else:
+            logs = await connector.read_console_logs(count)
+        cursor = connector.console_session.buffer.last_seq
         
         if not logs:
-            return "📝 暂无调试日志\n💡 请在微信开发者工具中触发一些操作以生成日志"
+            return f"📝 暂无调试日志\n💡 请在微信开发者工具中触发一些操作以生成日志\n📌 游标: {cursor}"
         
         # 格式化输出
-        output = [f"🔍 最新{len(logs)}条调试日志:"]
-        for log in logs:
-            level = log.get('level', 'log').upper()
-            text = log.get('text', '')[:100]  # 限制长度
-            output.append(f"[{level}] {text}")
+        if collapse:
+            output = [f"🔍 最新{len(logs)}类调试日志(重复消息已合并):"]
+            for group in logs:
+                output.append(format_group(group, max_length=100))
+        else:
+            output = [f"🔍 最新{len(logs)}条调试日志:"]
+            for log in logs:
+                output.append(format_record(log, max_length=100, with_source=True))  # 限制长度
+        output.append(f"📌 游标: {cursor} (传入since={cursor}只获取之后的新日志)")
         
         return "\n".join(output)
         
     except Exception as e:
         return f"❌ 读取日志失败: {str(e)}"
 
+@mcp.tool()
+async def top_log_talkers(limit: int = 10) -> str:
+    """列出本次会话中重复次数最多的日志消息(相同级别、模块、消息模板归为一组)"""
+    try:
+        connector.console_session.start()
+        groups = connector.console_session.groups.top(limit)
+        if not groups:
+            return "📝 暂无调试日志"
+        
+        output = [f"📊 出现最多的{len(groups)}类日志:"]
+        for group in groups:
+            rate = f", {group.rate:.1f}条/秒" if group.rate else ""
+            module_tag = f" [{group.module}]" if group.module else ""
+            output.append(f"   • {group.count}次{rate} [{group.level.upper()}]{module_tag} {group.template[:100]}")
+        return "\n".join(output)
+        
+    except Exception as e:
+        return f"❌ 统计日志失败: {str(e)}"
+
+@mcp.tool()
+async def query_debug_logs(level: str = "", module: str = "", target: str = "",
+                           since: str = "", until: str = "", pattern: str = "",
+                           cursor: int = 0, limit: int = 50, raw: bool = False) -> str:
+    """在服务器端筛选实时采集的控制台日志，只返回匹配的记录
+
+    level可用逗号分隔多个级别(如 'warn,error')，target为来源标签(调试目标名称#targetId前缀)的子串，
+    since/until 支持 '10m'、'2h' 这样的相对时间或 '2025-06-20T10:00' 形式的时间，
+    pattern为在消息中搜索的正则。结果按序号分页，把返回的cursor传回即可取下一页，
+    has_more为false时表示已取完。raw为true时每条记录附带原始CDP事件，
+    需要以环境变量 PWORD_KEEP_RAW=1 启动服务器才会保留
+    """
+    try:
+        predicate = record_filter(level=level, module=module, source=target,
+                                  since=parse_time_spec(since), until=parse_time_spec(until),
+                                  pattern=pattern)
+    except re.error as e:
+        return f"❌ 正则表达式无效: {e}"
+    except ValueError as e:
+        return f"❌ 时间格式无效: {e}"
+    
+    try:
+        records, next_cursor, dropped = await connector.read_console_logs_since(cursor, limit, predicate)
+        result = {
+            "cursor": next_cursor,
+            "has_more": next_cursor < connector.console_session.buffer.last_seq,
+            "dropped": dropped,
+            "records": [record_to_dict(seq, record, raw) for seq, record in records],
+        }
+        if raw:
+            # 未开启保留时raw均为null
+            result["raw_kept"] = connector.console_session.keep_raw
+        return json.dumps(result, ensure_ascii=False)
+        
+    except Exception as e:
+        return f"❌ 查询日志失败: {str(e)}"
+
+@mcp.tool()
+async def get_page_metrics(target: str = "") -> str:
+    """获取调试目标的页面性能指标(JS堆、DOM节点、布局次数等)
+
+    target为来源标签(调试目标名称#targetId前缀)的子串，为空时取第一个已连接的目标
+    """
+    try:
+        connector.console_session.start()
+        client = connector.console_session.client(target)
+        if client is None:
+            return "❌ 没有已连接的调试目标\n💡 请确认调试端口已开启，稍后再试"
+        
+        # 三条命令同时发出，在一次往返内完成
+        _, metrics, location = await asyncio.gather(
+            client.send('Performance.enable'),
+            client.send('Performance.getMetrics'),
+            client.send('Runtime.evaluate', {'expression': 'location.href', 'returnByValue': True}),
+        )
+        values = {metric['name']: metric['value'] for metric in metrics.get('metrics', [])}
+        
+        output = [
+            "📊 页面性能指标:",
+            f"🌐 页面: {location.get('result', {}).get('value', '未知')}",
+        ]
+        if 'JSHeapUsedSize' in values:
+            output.append(f"   • JS堆: {values['JSHeapUsedSize'] / 1024 / 1024:.1f}MB / "
+                          f"{values.get('JSHeapTotalSize', 0) / 1024 / 1024:.1f}MB")
+        for name, label in [('Nodes', 'DOM节点'), ('JSEventListeners', '事件监听器'),
+                            ('LayoutCount', '布局次数'), ('RecalcStyleCount', '样式重算次数'),
+                            ('ScriptDuration', '脚本耗时(秒)'), ('TaskDuration', '任务耗时(秒)')]:
+            if name in values:
+                output.append(f"   • {label}: {values[name]:g}")
+        return "\n".join(output)
+        
+    except Exception as e:
+        return f"❌ 获取性能指标失败: {str(e)}"
+
 @mcp.tool()
 async def analyze_project_errors() -> str:
     """分析P-Word项目中的潜在错误"""
@@ -203,46 +286,20 @@ async def analyze_project_errors() -> str:
             "project.config.json"
         ]
         
-        for file_path in required_files:
-            full_path = os.path.join(connector.project_path, file_path)
-            if not os.path.exists(full_path):
-                issues.append(f"缺失文件: {file_path}")
+        # 一次遍历完成文件存在性、JSON格式和console.error检查(在线程中执行，不阻塞其他请求)
+        files = await asyncio.to_thread(ProjectScanner(connector.project_path).scan)
+        for file_path in missing_files(files, required_files):
+            issues.append(f"缺失文件: {file_path}")
         
         # 检查JSON格式
         json_files = ["miniprogram/app.json", "project.config.json"]
         for json_file in json_files:
-            full_path = os.path.join(connector.project_path, json_file)
-            if os.path.exists(full_path):
-                try:
-                    with open(full_path, 'r', encoding='utf-8') as f:
-                        json.load(f)
-                except json.JSONDecodeError as e:
-                    issues.append(f"JSON格式错误 {json_file}: {e}")
+            error = files.get(json_file, {}).get('json_error')
+            if error:
+                issues.append(f"JSON格式错误 {json_file}: {error}")
         
         # 检查代码中的console.error
-        error_logs = []
-        js_files = []
-        miniprogram_dir = os.path.join(connector.project_path, "miniprogram")
-        
-        for root, dirs, files in os.walk(miniprogram_dir):
-            for file in files:
-                if file.endswith('.js'):
-                    js_files.append(os.path.join(root, file))
-        
-        for js_file in js_files:
-            try:
-                with open(js_file, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                    
-                for i, line in enumerate(lines):
-                    if 'console.error' in line:
-                        error_logs.append({
-                            'file': os.path.relpath(js_file, connector.project_path),
-                            'line': i + 1,
-                            'content': line.strip()
-                        })
-            except Exception:
-                continue
+        error_logs = await asyncio.to_thread(console_calls, files, ('error',))
         
         # 生成报告
         result = ["🔍 P-Word项目错误分析:"]
@@ -264,6 +321,37 @@ async def analyze_project_errors() -> str:
     except Exception as e:
         return f"❌ 项目分析失败: {str(e)}"
 
+@mcp.tool()
+async def query_log_history(level: str = "", module: str = "", since: str = "",
+                            until: str = "", text: str = "", limit: int = 50) -> str:
+    """查询开发者工具日志历史(按级别、模块、时间范围、全文检索)
+
+    since/until 支持 '2h'、'7d' 这样的相对时间或 '2025-06-20T10:00' 形式的时间
+    """
+    try:
+        since_time, until_time = parse_time_spec(since), parse_time_spec(until)
+        
+        def search(index: LogIndex) -> List[Dict]:
+            # 先增量导入新写入的日志
+            index.ingest()
+            return index.query(level=level, module=module, since=since_time, until=until_time,
+                               text=text, limit=limit)
+        
+        entries = await connector.run_in_index_thread(search)
+        
+        if not entries:
+            return "📝 没有符合条件的日志"
+        
+        output = [f"🔍 符合条件的日志({len(entries)}条):"]
+        for entry in entries:
+            when = datetime.fromtimestamp(entry['timestamp']).strftime('%m-%d %H:%M:%S')
+            module_tag = f" [{entry['module']}]" if entry['module'] else ""
+            output.append(f"[{when}] [{entry['level'].upper()}]{module_tag} {entry['message'][:200]}")
+        return "\n".join(output)
+        
+    except Exception as e:
+        return f"❌ 查询日志失败: {str(e)}"
+
 @mcp.tool()
 async def enable_debug_guide() -> str:
     """获取启用调试模式的详细指导"""
@@ -297,15 +385,19 @@ async def enable_debug_guide() -> str:
 
 🎯 启用后可使用的MCP工具:
 - check_devtools_status() - 检查状态
-- read_debug_logs() - 读取日志
+- read_debug_logs() - 读取日志(传入since游标可增量拉取)
+- query_debug_logs() - 按级别/模块/目标/时间/正则筛选实时日志
+- top_log_talkers() - 重复次数最多的日志
+- get_page_metrics() - 页面性能指标
 - analyze_project_errors() - 分析错误
+- query_log_history() - 查询日志历史
 """
 
 if __name__ == "__main__":
     import uvicorn
     print("🚀 启动微信开发者工具调试MCP服务器...")
     print("🔌 服务地址: http://localhost:8001")
-    print("📝 可用工具: check_devtools_status, read_debug_logs, analyze_project_errors")
+    print("📝 可用工具: check_devtools_status, read_debug_logs, query_debug_logs, top_log_talkers, get_page_metrics, analyze_project_errors, query_log_history")
     
     # 运行服务器
     uvicorn.run(mcp.create_app(), host="127.0.0.1", port=8001) 
\ No newline at end of file
@@ -6,129 +6,34 @@
 
 import json
 import os
-import subprocess
 import asyncio
-import websockets
-import psutil
 from typing import List, Dict, Any, Optional
 from mcp.server.fastmcp import FastMCP
 from pathlib import Path
+from lazy_import import lazy_import
+# 较重的依赖启动时只检查是否安装，首次使用时才加载
+lazy_import('psutil')
+from cdp_session import DevToolsConnection
+from devtools_logs import format_record
 
-# 创建MCP服务器
-mcp = FastMCP("WeChat DevTools Debug Reader")
-
-class WeChatDevToolsConnector:
+class WeChatDevToolsConnector(DevToolsConnection):
     """微信开发者工具连接器"""
     
-    def __init__(self):
-        self.devtools_port = None
-        self.websocket_url = None
-        self.debug_logs = []
-        
-    async def find_devtools_process(self) -> Optional[Dict]:
-        """查找微信开发者工具进程"""
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-            try:
-                if 'wechatdevtools' in proc.info['name'].lower() or \
-                   '微信开发者工具' in str(proc.info['cmdline']):
-                    return proc.info
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-        return None
-    
-    async def get_debug_port(self) -> Optional[int]:
-        """获取开发者工具的调试端口"""
-        # 常见的调试端口
-        common_ports = [9222, 9223, 9224, 9225]
-        
-        for port in common_ports:
-            try:
-                # 尝试连接Chrome DevTools Protocol
-                import aiohttp
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(f'http://localhost:{port}/json') as resp:
-                        if resp.status == 200:
-                            return port
-            except:
-                continue
-        return None
-    
     async def connect_to_devtools(self) -> bool:
         """连接到开发者工具"""
-        port = await self.get_debug_port()
-        if port:
-            self.devtools_port = port
-            self.websocket_url = f"ws://localhost:{port}"
-            return True
-        return False
-    
-    async def read_console_logs(self) -> List[Dict]:
-        """读取控制台日志"""
-        if not self.websocket_url:
-            return []
-            
-        try:
-            import aiohttp
-            async with aiohttp.ClientSession() as session:
-                # 获取可用的tab页面
-                async with session.get(f'http://localhost:{self.devtools_port}/json') as resp:
-                    tabs = await resp.json()
-                    
-                # 查找小程序相关的tab
-                for tab in tabs:
-                    if 'miniprogram' in tab.get('url', '').lower() or \
-                       'p-word' in tab.get('title', '').lower():
-                        
-                        # 连接WebSocket获取日志
-                        ws_url = tab['webSocketDebuggerUrl']
-                        async with websockets.connect(ws_url) as websocket:
-                            # 启用Runtime域
-                            await websocket.send(json.dumps({
-                                "id": 1,
-                                "method": "Runtime.enable"
-                            }))
-                            
-                            # 启用Console域
-                            await websocket.send(json.dumps({
-                                "id": 2,
-                                "method": "Console.enable"
-                            }))
-                            
-                            # 获取控制台消息
-                            await websocket.send(json.dumps({
-                                "id": 3,
-                                "method": "Runtime.evaluate",
-                                "params": {
-                                    "expression": "console.log('MCP连接成功')"
-                                }
-                            }))
-                            
-                            # 监听消息
-                            logs = []
-                            timeout = 5  # 5秒超时
-                            try:
-                                while timeout > 0:
-                                    message = await asyncio.wait_for(websocket.recv(), timeout=1)
-                                    data = json.loads(message)
-                                    
-                                    if data.get('method') == 'Console.messageAdded':
-                                        logs.append(data['params']['message'])
-                                    elif data.get('method') == 'Runtime.consoleAPICalled':
-                                        logs.append(data['params'])
-                                    
-                                    timeout -= 1
-                            except asyncio.TimeoutError:
-                                pass
-                            
-                            return logs
-                            
-        except Exception as e:
-            print(f"连接调试器失败: {e}")
-            return []
+        return await self.get_debug_port() is not None
+
+    async def read_console_logs(self, limit: int = 10) -> List[Dict]:
+        """读取控制台日志(直接取自后台采集的缓冲区)"""
+        self.console_session.start()
+        return self.console_session.buffer.latest(limit)
 
 # 实例化连接器
 devtools_connector = WeChatDevToolsConnector()
 
+# 创建MCP服务器
+mcp = FastMCP("WeChat DevTools Debug Reader", lifespan=devtools_connector.lifespan)
+
 @mcp.tool()
 async def read_wechat_devtools_logs() -> str:
     """读取微信开发者工具的调试日志"""
@@ -152,11 +57,7 @@ async def read_wechat_devtools_logs() -> str:
         # 格式化日志输出
         log_output = ["🔍 微信开发者工具调试日志:"]
         for log in logs[-10:]:  # 显示最新10条
-            if isinstance(log, dict):
-                level = log.get('level', 'log')
-                text = log.get('text', str(log))
-                timestamp = log.get('timestamp', '')
-                log_output.append(f"[{level.upper()}] {text}")
+            log_output.append(format_record(log, with_source=True))
         
         return "\n".join(log_output)
         
@@ -167,13 +68,16 @@ async def read_wechat_devtools_logs() -> str:
 async def get_devtools_status() -> str:
     """获取微信开发者工具状态信息"""
     try:
+        # 状态快照有效时直接取缓存
+        snapshot = await devtools_connector.status_cache.get()
+        
         # 查找进程
-        process_info = await devtools_connector.find_devtools_process()
+        process_info = snapshot['process']
         if not process_info:
             return "❌ 微信开发者工具未运行"
         
         # 获取调试端口
-        port = await devtools_connector.get_debug_port()
+        port = snapshot['port']
         
         status_info = [
             "📱 微信开发者工具状态:",
@@ -197,14 +101,8 @@ async def get_devtools_status() -> str:
 async def fix_common_issues() -> str:
     """自动修复常见问题"""
     try:
-        issues_fixed = []
-        
         # 检查项目路径
         project_path = "/Users/gongshenshen/KnowledgeBase/20_学习中/P-Word"
-        if os.path.exists(project_path):
-            issues_fixed.append("✅ 项目路径存在")
-        else:
-            issues_fixed.append("❌ 项目路径不存在")
         
         # 检查关键文件
         key_files = [
@@ -213,12 +111,22 @@ async def fix_common_issues() -> str:
             "project.config.json"
         ]
         
-        for file_path in key_files:
-            full_path = os.path.join(project_path, file_path)
-            if os.path.exists(full_path):
-                issues_fixed.append(f"✅ {file_path} 存在")
+        def check_files() -> List[str]:
+            results = []
+            if os.path.exists(project_path):
+                results.append("✅ 项目路径存在")
             else:
-                issues_fixed.append(f"❌ {file_path} 缺失")
+                results.append("❌ 项目路径不存在")
+            for file_path in key_files:
+                full_path = os.path.join(project_path, file_path)
+                if os.path.exists(full_path):
+                    results.append(f"✅ {file_path} 存在")
+                else:
+                    results.append(f"❌ {file_path} 缺失")
+            return results
+        
+        # 文件系统检查在线程中执行(项目在网络盘上时可能很慢)
+        issues_fixed = await asyncio.to_thread(check_files)
         
         # 检查端口占用
         port = await devtools_connector.get_debug_port()